@@ -9,7 +9,9 @@ Created on Tue Mar  3 20:57:02 2020
 #comparison of convergence speed for GD and Nesterov for qudratic functions#
 
 import numpy as np
-import matplotlib.pyplot as plt
+
+from recorder import trajectory_recorder
+from render import render_all
 
 A=1
 B=10000
@@ -125,6 +127,11 @@ kappa=np.sqrt(L/m)
 lr=1/L
 alpha=1/L
 beta=(np.sqrt(kappa)-1)/(np.sqrt(kappa)+1)
+#record every k-th step of the trajectory#
+record_every=1
+#render the figures without showing them, in render_processes worker processes (None uses all cores)#
+headless=False
+render_processes=None
 
 if __name__ == "__main__":
     function=function_f()
@@ -134,53 +141,38 @@ if __name__ == "__main__":
     optname="GD"
     x_current=x_seed
     x_current_minus1=x_current
-    trajectory_x_1=[]
-    trajectory_x_2=[]
-    loss_GD=[]
-    distance_GD=[]
+    recorder=trajectory_recorder(capacity=1000//record_every+1, every=record_every)
     for i in range(1000):
-        trajectory_x_1.append(x_current[0]) 
-        trajectory_x_2.append(x_current[1])
-        loss_GD.append(function.value(x_current[0], x_current[1]))
-        distance_GD.append(np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
+        if recorder.due(i):
+            recorder.record(i, x_current[0], x_current[1], function.value(x_current[0], x_current[1]), np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
         optimization=optimizer(function=function)
         x=x_current+optimization.update(x_current[0], x_current[1], x_current_minus1[0], x_current_minus1[1], lr, alpha, beta, optname)
         x_current_minus1=x_current
         x_current=x
+    loss_GD=recorder["loss"]
+    distance_GD=recorder["distance"]
 
     #get the loss and distance to zero sequence for Nesterov#
     optname="Nesterov"
     x_current=x_seed
     x_current_minus1=x_current
-    trajectory_x_1=[]
-    trajectory_x_2=[]
-    loss_nesterov=[]
-    distance_nesterov=[]
+    recorder=trajectory_recorder(capacity=1000//record_every+1, every=record_every)
     for i in range(1000):
-        trajectory_x_1.append(x_current[0]) 
-        trajectory_x_2.append(x_current[1])
-        loss_nesterov.append(function.value(x_current[0], x_current[1]))
-        distance_nesterov.append(np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
+        if recorder.due(i):
+            recorder.record(i, x_current[0], x_current[1], function.value(x_current[0], x_current[1]), np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
         optimization=optimizer(function=function)
         x=x_current+optimization.update(x_current[0], x_current[1], x_current_minus1[0], x_current_minus1[1], lr, alpha, beta, optname)
         x_current_minus1=x_current
         x_current=x
+    loss_nesterov=recorder["loss"]
+    distance_nesterov=recorder["distance"]
+    steps=recorder.steps()
 
     #plot and compare the loss and distance to zero sequences for GD and Nesterov#
-    plt.figure(figsize = (14,10))
-    plt.plot(loss_GD, '-', color='r')
-    plt.plot(loss_nesterov, '--', color='b')
-    plt.xlabel('iteration')
-    plt.ylabel('loss')
-    plt.title('function loss for GD (red, solid) and Nesterov (blue, dashed)')
-    plt.savefig('loss_GDvsNesterov_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')
-    plt.show()  
-
-    plt.figure(figsize = (14,10))
-    plt.plot(distance_GD, '-', color='r')
-    plt.plot(distance_nesterov, '--', color='b')
-    plt.xlabel('iteration')
-    plt.ylabel('distance to zero')
-    plt.title('distance to zero for GD (red, solid) and Nesterov (blue, dashed)')
-    plt.savefig('distance0_GDvsNesterov_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')
-    plt.show()  
+    jobs=[("curves", dict(lines=[(steps, loss_GD, 'r-'), (steps, loss_nesterov, 'b--')], figsize=(14,10),
+                          xlabel='iteration', ylabel='loss', title='function loss for GD (red, solid) and Nesterov (blue, dashed)',
+                          filename='loss_GDvsNesterov_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')),
+          ("curves", dict(lines=[(steps, distance_GD, 'r-'), (steps, distance_nesterov, 'b--')], figsize=(14,10),
+                          xlabel='iteration', ylabel='distance to zero', title='distance to zero for GD (red, solid) and Nesterov (blue, dashed)',
+                          filename='distance0_GDvsNesterov_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg'))]
+    render_all(jobs, headless=headless, processes=render_processes)
@@ -3,10 +3,9 @@
 #developed under tensorflow v1.14.0#
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib import animation
+
+from recorder import trajectory_recorder
+from render import landscape, render_all
 
 import tensorflow as tf
 tf.enable_eager_execution() #tf.placeholder is not allowed in eager_execution mode#
@@ -51,7 +50,8 @@ class function_g(object):
                  name="g"):
         self.axA=axA
         self.axB=axB
-        self.eps=epsilon
+        #a python float, an int constant would not multiply the float32 tensors of the compiled loop#
+        self.eps=float(eps)
         self.name=name
         
     def value(self, tfx_1, tfx_2):
@@ -92,7 +92,7 @@ class grad(object):
     
     def calculate(self, tfx_1, tfx_2):
         with tf.GradientTape() as tape:
-            y=function.value(tfx_1, tfx_2)
+            y=self.function.value(tfx_1, tfx_2)
         grad_x_1, grad_x_2=tape.gradient(y, [tfx_1, tfx_2])
         return np.array([grad_x_1.numpy(), grad_x_2.numpy()])
     
@@ -144,93 +144,125 @@ class optimizer(object):
 
     
     
+"""
+The compiled optimizer for: GD, Heavy-Ball, Nesterov
+the whole iteration loop runs inside one tf.function on the persistent variables x and x_old,
+the trajectory and the loss sequence are returned as tensors at the end of the loop
+"""
+class compiled_optimizer(object):
+    def __init__(self, 
+                 function=function_f(),
+                 optimizer="GD",
+                 lr=0.01,
+                 alpha=0.01,
+                 beta=1):
+        self.function=function
+        self.optimizer=optimizer
+        self.lr=float(lr)
+        self.alpha=float(alpha)
+        self.beta=float(beta)
+        #the variables are created once here and only re-assigned afterwards#
+        self.tfx=tf.Variable(initial_value=[0, 0], dtype='float')
+        self.tfx_old=tf.Variable(initial_value=[0, 0], dtype='float')
+        self.iterate=tf.function(self.loop)
+    
+    def grad(self, x):
+        with tf.GradientTape() as tape:
+            tape.watch(x)
+            y=self.function.value(x[0], x[1])
+        return tape.gradient(y, x)
+    
+    def update(self, x, x_old):
+        momentum=x-x_old
+        if self.optimizer=="GD":
+            update=-self.lr*self.grad(x)
+        elif self.optimizer=="HeavyBall":
+            update=-self.alpha*self.grad(x)+self.beta*momentum
+        elif self.optimizer=="Nesterov":
+            update=-self.alpha*self.grad(x+self.beta*momentum)+self.beta*momentum
+        else:
+            update=tf.zeros_like(x)
+        return update
+    
+    def loop(self, steps):
+        trajectory=tf.TensorArray(dtype='float', size=steps)
+        loss=tf.TensorArray(dtype='float', size=steps)
+        for i in tf.range(steps):
+            x=self.tfx.read_value()
+            x_old=self.tfx_old.read_value()
+            trajectory=trajectory.write(i, x)
+            loss=loss.write(i, self.function.value(x[0], x[1]))
+            self.tfx_old.assign(x)
+            self.tfx.assign(x+self.update(x, x_old))
+        return trajectory.stack(), loss.stack()
+    
+    #run the compiled loop from x_init, returns the trajectory tensor (steps, 2) and the loss tensor (steps,)#
+    def run(self, x_init, steps):
+        self.tfx.assign(tf.cast(x_init, 'float'))
+        self.tfx_old.assign(tf.cast(x_init, 'float'))
+        return self.iterate(tf.constant(steps))
+
+
+
 #test and plot the trajectory#
 
 lr=0.01
 alpha=0.01
 beta=1
+#run the whole iteration loop inside one compiled tf.function#
+compiled=True
+#record every k-th step of the trajectory#
+record_every=1
+#export at most max_frames frames of the animation (None keeps all), rendered by animation_processes worker processes#
+max_frames=None
+animation_processes=1
+#render the figures without showing them, in render_processes worker processes (None uses all cores)#
+headless=False
+render_processes=None
+#directory of the landscape surfaces cached on disk (None: no disk cache)#
+landscape_cache='landscapes'
 
 if __name__ == "__main__":
+    jobs=[]
     for optname in {"GD", "HeavyBall", "Nesterov"}:
         x_current=np.random.uniform(-1, 1, size=2)
         x_current_minus1=x_current
-        trajectory_x_1=[]
-        trajectory_x_2=[]
-        loss=[]
-        distance=[]
+        recorder=trajectory_recorder(capacity=1000//record_every+1, every=record_every)
         function=function_g()
-        for i in range(1000):
-            trajectory_x_1.append(x_current[0]) 
-            trajectory_x_2.append(x_current[1])
-            tfx_1=tf.Variable(initial_value=x_current[0], dtype='float')
-            tfx_2=tf.Variable(initial_value=x_current[1], dtype='float')
-            loss.append(function.value(tfx_1, tfx_2).numpy())
-            distance.append(np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
-            optimization=optimizer(function=function)
-            x=x_current+optimization.update(x_current[0], x_current[1], x_current_minus1[0], x_current_minus1[1], lr, alpha, beta, optname)
-            x_current_minus1=x_current
-            x_current=x
-
-        fig = plt.figure()
-        ax = Axes3D(fig)
-        u = np.linspace(-10, 10, 100)
-        v = np.linspace(-10, 10, 100)
-        u=np.array(u)
-        v=np.array(v)
-        u, v = np.meshgrid(u, v)
-        w=function.value(u,v)
-        ax.plot_surface(u, v, w, rstride=1, cstride=1, cmap='summer')
-        ax.set_xlabel('x_1')
-        ax.set_ylabel('x_2')
-        ax.set_zlabel(function.name+'(x_1, x_2)')
-        plt.savefig('Landscape_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')
-        plt.show()
-
-        fig = plt.figure()
-        mpl.rcParams['legend.fontsize'] = 10
-        ax = fig.gca(projection='3d')
-        ax.plot(trajectory_x_1, trajectory_x_2, loss, label=optname+' trajectory', color='r')
-        ax.legend()
-        ax.set_xlabel('x_1')
-        ax.set_ylabel('x_2')
-        ax.set_zlabel(function.name+'(x_1, x_2)') 
-        plt.show()
-
-        plt.plot(trajectory_x_1, trajectory_x_2)
-        plt.xlabel('x_1')
-        plt.ylabel('x_2')
-        plt.title(optname)
-        plt.show()
-
-        plt.plot(loss)
-        plt.xlabel('iteration')
-        plt.ylabel('function error to minimum')
-        plt.title(optname)
-        plt.savefig('Loss_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')
-        plt.show()
-
-        plt.plot(distance)
-        plt.xlabel('iteration')
-        plt.ylabel('distance to minimizer')
-        plt.title(optname)
-        plt.savefig('Distance_To_Zero_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')
-        plt.show()
-
-        fig = plt.figure()
-        ax=Axes3D(fig)
-        line=ax.plot([],[],'b:')
-        point=ax.plot([],[],'bo',markersize=10)
-        images=[]
-        def init():
-            line=ax.plot([],[],'b:',markersize=8)
-            point=ax.plot([],[],'bo',markersize=10)
-            return line,point
-        def anmi(i):
-            ax.clear()
-            line =ax.plot(trajectory_x_1[0:i],trajectory_x_2[0:i],loss[0:i],'b:', markersize=8)
-            point = ax.plot(trajectory_x_1[i-1:i],trajectory_x_2[i-1:i],loss[i-1:i],'bo', markersize=10)
-            return line,point
-        anim = animation.FuncAnimation(fig, anmi, init_func=init,
-                                       frames=1000, interval=10, blit=False,repeat=False)
-        anim.save(optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.gif', writer='imagemagick')
+        if compiled:
+            optimization=compiled_optimizer(function=function, optimizer=optname, lr=lr, alpha=alpha, beta=beta)
+            trajectory, loss=optimization.run(x_current, 1000)
+            trajectory=trajectory.numpy()[::record_every]
+            loss=loss.numpy()[::record_every]
+            distance=np.sqrt(trajectory[:,0]**2+trajectory[:,1]**2)
+            recorder.extend(np.arange(0, 1000, record_every), np.column_stack([trajectory, loss, distance]))
+        else:
+            for i in range(1000):
+                if recorder.due(i):
+                    tfx_1=tf.Variable(initial_value=x_current[0], dtype='float')
+                    tfx_2=tf.Variable(initial_value=x_current[1], dtype='float')
+                    recorder.record(i, x_current[0], x_current[1], function.value(tfx_1, tfx_2).numpy(), np.sqrt(x_current[0]*x_current[0]+x_current[1]*x_current[1]))
+                optimization=optimizer(function=function)
+                x=x_current+optimization.update(x_current[0], x_current[1], x_current_minus1[0], x_current_minus1[1], lr, alpha, beta, optname)
+                x_current_minus1=x_current
+                x_current=x
+        trajectory_x_1=recorder["x_1"]
+        trajectory_x_2=recorder["x_2"]
+        loss=recorder["loss"]
+        distance=recorder["distance"]
+
+        u, v, w=landscape(function, cachedir=landscape_cache)
+        jobs.append(("surface", dict(u=u, v=v, w=w, zlabel=function.name+'(x_1, x_2)',
+                                     filename='Landscape_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')))
+        jobs.append(("curve3d", dict(x=trajectory_x_1, y=trajectory_x_2, z=loss, label=optname+' trajectory', zlabel=function.name+'(x_1, x_2)')))
+        jobs.append(("curves", dict(lines=[(trajectory_x_1, trajectory_x_2)], xlabel='x_1', ylabel='x_2', title=optname)))
+        jobs.append(("curves", dict(lines=[(recorder.steps(), loss)], xlabel='iteration', ylabel='function error to minimum', title=optname,
+                                    filename='Loss_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')))
+        jobs.append(("curves", dict(lines=[(recorder.steps(), distance)], xlabel='iteration', ylabel='distance to minimizer', title=optname,
+                                    filename='Distance_To_Zero_'+optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.jpg')))
+        jobs.append(("animation", dict(x_1=trajectory_x_1, x_2=trajectory_x_2, z=loss, interval=10, max_frames=max_frames, processes=animation_processes,
+                                       filename=optname+'_A='+str(A)+'_B='+str(B)+'_alpha='+str(alpha)+'_beta='+str(beta)+'_eps='+str(epsilon)+'.gif')))
+
+    #render all the figures, on the Agg backend in a process pool when headless#
+    render_all(jobs, headless=headless, processes=render_processes)
 
@@ -0,0 +1,134 @@
+"""
+A streaming recorder for the optimization trajectories
+
+the recorded quantities (x_1, x_2, loss, distance, ...) are written row by row into preallocated
+or chunked numpy buffers instead of Python lists of numpy scalars.
+Optionally only every k-th step is recorded (decimation), and for very long runs
+the rows can be spilled into a memory-mapped .npy file, whose number of recorded rows
+is kept in the sidecar file <filename>.rows.
+"""
+
+import os
+import numpy as np
+
+
+class trajectory_recorder(object):
+    def __init__(self,
+                 fields=("x_1", "x_2", "loss", "distance"),
+                 capacity=None,
+                 every=1,
+                 chunksize=4096,
+                 filename=None):
+        """
+        fields: the names of the recorded quantities, one column each
+        capacity: number of rows preallocated in the first buffer, later rows go into new chunks
+        every: record every k-th step only
+        chunksize: number of rows of each additional chunk
+        filename: if given, the rows are written into a memory-mapped .npy file of `capacity` rows,
+                  flush() writes them through and stores their number in <filename>.rows
+        """
+        self.fields=tuple(fields)
+        self.columns={name: j+1 for j, name in enumerate(self.fields)}
+        self.every=max(int(every), 1)
+        self.chunksize=int(chunksize)
+        self.filename=filename
+        #column 0 of every row is the step index, the recorded fields follow#
+        width=len(self.fields)+1
+        if filename is not None:
+            if capacity is None:
+                raise ValueError("a memory-mapped recorder needs its capacity")
+            first=np.lib.format.open_memmap(filename, mode='w+', dtype='float64', shape=(int(capacity), width))
+        else:
+            first=np.empty((int(capacity) if capacity else self.chunksize, width))
+        self.chunks=[first]
+        self.fill=0
+        self.size=0
+        self.cache=None
+        if filename is not None:
+            write_row_count(filename, 0)
+
+    #whether the given step is recorded under the decimation#
+    def due(self, step):
+        return step%self.every==0
+
+    #write one row: the step index followed by the values of the fields in order#
+    def record(self, step, *values):
+        chunk=self.chunks[-1]
+        if self.fill==chunk.shape[0]:
+            if self.filename is not None:
+                raise IndexError("the recorder file "+str(self.filename)+" is full")
+            chunk=np.empty((self.chunksize, chunk.shape[1]))
+            self.chunks.append(chunk)
+            self.fill=0
+        chunk[self.fill, 0]=step
+        chunk[self.fill, 1:]=values
+        self.fill+=1
+        self.size+=1
+        self.cache=None
+
+    #write a block of rows at once: steps has shape (k,), values has shape (k, len(fields))#
+    def extend(self, steps, values):
+        steps=np.asarray(steps)
+        values=np.asarray(values)
+        start=0
+        while start<len(steps):
+            chunk=self.chunks[-1]
+            if self.fill==chunk.shape[0]:
+                if self.filename is not None:
+                    raise IndexError("the recorder file "+str(self.filename)+" is full")
+                chunk=np.empty((max(self.chunksize, len(steps)-start), chunk.shape[1]))
+                self.chunks.append(chunk)
+                self.fill=0
+            k=min(chunk.shape[0]-self.fill, len(steps)-start)
+            chunk[self.fill:self.fill+k, 0]=steps[start:start+k]
+            chunk[self.fill:self.fill+k, 1:]=values[start:start+k]
+            self.fill+=k
+            self.size+=k
+            start+=k
+        self.cache=None
+
+    #all the recorded rows as one (size, 1+len(fields)) array#
+    def rows(self):
+        if self.cache is None:
+            if len(self.chunks)==1:
+                self.cache=self.chunks[0][:self.size]
+            else:
+                self.cache=np.concatenate(self.chunks[:-1]+[self.chunks[-1][:self.fill]])
+        return self.cache
+
+    #the recorded step indices#
+    def steps(self):
+        return self.rows()[:, 0].astype('int64')
+
+    #the recorded values of one field, e.g. recorder["loss"]#
+    def __getitem__(self, name):
+        return self.rows()[:, self.columns[name]]
+
+    def __len__(self):
+        return self.size
+
+    #write the rows of a memory-mapped recorder through to the file, then their number to the sidecar file#
+    def flush(self):
+        if self.filename is not None:
+            self.chunks[0].flush()
+            write_row_count(self.filename, self.size)
+
+
+#the sidecar file holding the number of recorded rows of a memory-mapped recorder#
+def row_count_file(filename):
+    return filename+'.rows'
+
+
+def write_row_count(filename, rows):
+    with open(row_count_file(filename), 'w') as file:
+        file.write(str(int(rows)))
+
+
+#load the rows written by a memory-mapped recorder, dropping the unused tail of the file#
+#a file without the sidecar (not written by the recorder) is loaded whole#
+def load_trajectory(filename, mmap_mode='r'):
+    data=np.load(filename, mmap_mode=mmap_mode)
+    if os.path.exists(row_count_file(filename)):
+        with open(row_count_file(filename)) as file:
+            data=data[:int(file.read())]
+    return data
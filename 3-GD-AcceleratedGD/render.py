@@ -0,0 +1,164 @@
+"""
+Headless batch rendering of the experiment figures
+
+an experiment collects its recorded results (trajectories, losses) into a list of figure jobs,
+each job is a pair (kind, arguments) describing one figure and the file it is saved to.
+In headless mode all jobs are rendered non-interactively on the Agg backend in a process pool,
+otherwise they are drawn one after another and shown.
+The landscape surfaces shared by several figures are evaluated once per function parameters,
+and can be cached on disk across runs.
+"""
+
+import os
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+from mpl_toolkits.mplot3d import Axes3D
+from multiprocessing import Pool
+
+from animate import save_animation
+
+
+#the evaluated landscape surfaces (u, v, w), keyed by the function and its parameters (A, B, epsilon) and the meshgrid#
+surfaces={}
+
+#the .npz file caching the landscape surface of the given key#
+def landscape_filename(key):
+    classname, name, axA, axB, eps, resolution, bounds=key
+    return ('Landscape_'+classname+'_'+str(name)+'_A='+str(axA)+'_B='+str(axB)+'_eps='+str(eps)
+            +'_resolution='+str(resolution)+'_bounds='+str(bounds[0])+','+str(bounds[1])+'.npz')
+
+"""
+the landscape surface of the function over a resolution x resolution meshgrid of bounds x bounds
+the surfaces are kept in memory, and with cachedir also stored on disk as .npz files to be reused by later runs
+"""
+def landscape(function, bounds=(-10, 10), resolution=100, cachedir=None):
+    key=(type(function).__name__, function.name,
+         getattr(function, 'axA', None), getattr(function, 'axB', None), getattr(function, 'eps', None),
+         resolution, tuple(bounds))
+    if key in surfaces:
+        return surfaces[key]
+    u=np.linspace(bounds[0], bounds[1], resolution)
+    v=np.linspace(bounds[0], bounds[1], resolution)
+    u, v=np.meshgrid(u, v)
+    filename=None if cachedir is None else os.path.join(cachedir, landscape_filename(key))
+    if filename is not None and os.path.exists(filename):
+        with np.load(filename) as data:
+            w=data['w']
+    else:
+        w=np.asarray(function.value(u, v))
+        if filename is not None:
+            os.makedirs(cachedir, exist_ok=True)
+            #write to a temporary file first so that an interrupted run leaves no broken cache#
+            with open(filename+'.tmp', 'wb') as file:
+                np.savez(file, w=w)
+            os.replace(filename+'.tmp', filename)
+    surfaces[key]=(u, v, w)
+    return surfaces[key]
+
+
+#the landscape surface w=f(u, v) over the meshgrid (u, v)#
+def surface(u, v, w, xlabel='x_1', ylabel='x_2', zlabel='', title=None, cmap='summer'):
+    fig=plt.figure()
+    ax=fig.add_subplot(111, projection='3d')
+    ax.plot_surface(u, v, w, rstride=1, cstride=1, cmap=cmap)
+    if title is not None:
+        ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_zlabel(zlabel)
+    return fig
+
+
+#a 3-d curve, e.g. the trajectory (x_1, x_2, loss)#
+def curve3d(x, y, z, label=None, color='r', xlabel='x_1', ylabel='x_2', zlabel=''):
+    fig=plt.figure()
+    mpl.rcParams['legend.fontsize'] = 10
+    ax=fig.add_subplot(111, projection='3d')
+    ax.plot(x, y, z, label=label, color=color)
+    if label is not None:
+        ax.legend()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_zlabel(zlabel)
+    return fig
+
+
+#one or several 2-d curves, each given as (x, y) or (x, y, format string)#
+def curves(lines, xlabel='', ylabel='', title=None, legend=None, loc='upper right', figsize=None):
+    fig=plt.figure(figsize=figsize)
+    for line in lines:
+        plt.plot(*line)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if title is not None:
+        plt.title(title)
+    if legend is not None:
+        plt.legend(legend, loc=loc)
+    return fig
+
+
+#mean curves with a shaded band between a lower and an upper curve (e.g. quantiles over seeds), each given as (x, mean, lower, upper)#
+def bands(lines, xlabel='', ylabel='', title=None, legend=None, loc='upper right', figsize=None, alpha=0.3):
+    fig=plt.figure(figsize=figsize)
+    handles=[]
+    for x, mean, lower, upper in lines:
+        line,=plt.plot(x, mean)
+        plt.fill_between(x, lower, upper, color=line.get_color(), alpha=alpha)
+        handles.append(line)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if title is not None:
+        plt.title(title)
+    if legend is not None:
+        plt.legend(handles, legend, loc=loc)
+    return fig
+
+
+kinds={"surface": surface,
+       "curve3d": curve3d,
+       "curves": curves,
+       "bands": bands}
+
+
+"""
+render one job (kind, arguments), the file name is arguments["filename"] (None: not saved)
+the kind "animation" takes the arguments of save_animation and writes the GIF
+"""
+def render(job, show=False):
+    kind, arguments=job
+    arguments=dict(arguments)
+    filename=arguments.pop("filename", None)
+    savefig_options=arguments.pop("savefig", {})
+    if kind=="animation":
+        if filename is not None:
+            save_animation(filename=filename, **arguments)
+        return
+    fig=kinds[kind](**arguments)
+    if filename is not None:
+        fig.savefig(filename, **savefig_options)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def render_headless(job):
+    plt.switch_backend('Agg')
+    render(job, show=False)
+
+
+"""
+render all figure jobs
+headless=True: render on the Agg backend in a pool of processes (None uses all cores), figures without a file name are skipped
+headless=False: render in this process one after another and show every figure
+"""
+def render_all(jobs, headless=False, processes=None):
+    if headless:
+        #the pool workers cannot start pools of their own, so the animations are rendered by a single process each#
+        jobs=[(kind, dict(arguments, processes=1) if kind=="animation" else arguments)
+              for kind, arguments in jobs if arguments.get("filename") is not None]
+        with Pool(processes) as pool:
+            pool.map(render_headless, jobs, chunksize=1)
+    else:
+        for job in jobs:
+            render(job, show=True)
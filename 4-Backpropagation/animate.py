@@ -0,0 +1,83 @@
+"""
+Fast export of the trajectory animations
+
+the dotted line and the moving point are created once and only their data is updated at each frame,
+the frames can be subsampled, and the GIF is encoded in-process with Pillow instead of imagemagick.
+The frames can also be rendered in parallel worker processes.
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib import animation
+from mpl_toolkits.mplot3d import Axes3D
+from multiprocessing import Pool
+from PIL import Image
+
+
+#the frames to export: frame k shows the first indices[k] points, at most max_frames frames and the last one always kept#
+def frame_indices(length, max_frames=None):
+    if max_frames is None or length<=max_frames:
+        return np.arange(1, length+1)
+    return np.unique(np.linspace(1, length, max_frames).astype('int64'))
+
+
+#create the figure, the empty line and point, the axes limits are fixed from the whole trajectory#
+def setup(x_1, x_2, z):
+    fig=plt.figure()
+    ax=fig.add_subplot(111, projection='3d')
+    line,=ax.plot([], [], [], 'b:', markersize=8)
+    point,=ax.plot([], [], [], 'bo', markersize=10)
+    for data, setlim in ((x_1, ax.set_xlim), (x_2, ax.set_ylim), (z, ax.set_zlim)):
+        low, high=np.nanmin(data), np.nanmax(data)
+        margin=0.05*(high-low) if high>low else 0.5
+        setlim(low-margin, high+margin)
+    return fig, line, point
+
+
+#update the line to the first i points and the point to the i-th point#
+def draw(line, point, x_1, x_2, z, i):
+    line.set_data(x_1[:i], x_2[:i])
+    line.set_3d_properties(z[:i])
+    point.set_data(x_1[i-1:i], x_2[i-1:i])
+    point.set_3d_properties(z[i-1:i])
+    return line, point
+
+
+#render a block of frames into RGB arrays, run in a worker process#
+def render_frames(args):
+    x_1, x_2, z, indices=args
+    plt.switch_backend('Agg')
+    fig, line, point=setup(x_1, x_2, z)
+    images=[]
+    for i in indices:
+        draw(line, point, x_1, x_2, z, i)
+        fig.canvas.draw()
+        images.append(np.asarray(fig.canvas.buffer_rgba())[:, :, :3].copy())
+    plt.close(fig)
+    return images
+
+
+"""
+save the animation of the trajectory (x_1, x_2, z) as a GIF
+interval: the time between frames in milliseconds
+max_frames: subsample to at most this many frames, None keeps every frame
+processes: number of worker processes rendering the frames, 1 renders in this process
+"""
+def save_animation(x_1, x_2, z, filename, interval=10, max_frames=None, processes=1):
+    x_1=np.asarray(x_1, dtype='float64')
+    x_2=np.asarray(x_2, dtype='float64')
+    z=np.asarray(z, dtype='float64')
+    indices=frame_indices(len(z), max_frames)
+    if processes<=1:
+        fig, line, point=setup(x_1, x_2, z)
+        def anmi(k):
+            return draw(line, point, x_1, x_2, z, indices[k])
+        anim=animation.FuncAnimation(fig, anmi, frames=len(indices), interval=interval, blit=True, repeat=False)
+        anim.save(filename, writer=animation.PillowWriter(fps=1000/interval))
+        plt.close(fig)
+    else:
+        blocks=[block for block in np.array_split(indices, processes) if len(block)>0]
+        with Pool(processes) as pool:
+            parts=pool.map(render_frames, [(x_1, x_2, z, block) for block in blocks])
+        images=[Image.fromarray(image) for part in parts for image in part]
+        images[0].save(filename, save_all=True, append_images=images[1:], duration=interval, loop=0)
@@ -6,13 +6,12 @@ Created on Thu Feb 13 14:30:29 2020
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from activations import Sigmoid, ReLU, Tanh, Exponential
 from fullnetwork import onelayer, fullnetwork
 from backpropagation import backpropagation
-from mpl_toolkits.mplot3d import Axes3D 
-from matplotlib import animation
+from recorder import trajectory_recorder
+from animate import save_animation
 
 #number of hidden layers#
 L=3
@@ -22,6 +21,11 @@ n=np.random.randint(1, 5, size=L)
 sigma=Sigmoid() 
 #number of iterations#
 N=100
+#record every k-th step of the trajectory#
+record_every=1
+#export at most max_frames frames of the animation (None keeps all), rendered by animation_processes worker processes#
+max_frames=None
+animation_processes=1
 
 #set the network#
 network=fullnetwork(L=L, n=n, activation=sigma)
@@ -45,15 +49,13 @@ y=np.random.normal(0,1,1)
 
 #plot the gd trajectory via backpropagation#
 def plot_gd_trajectory(w1_init, w2_init, learningrate):
-    Loss=[]
-    w_1=[]
-    w_2=[]
-    w_1.append(float(w1_init))
-    w_2.append(float(w2_init))
+    recorder=trajectory_recorder(fields=("w_1", "w_2", "loss"), capacity=N//record_every+1, every=record_every)
+    w1_current=float(w1_init)
+    w2_current=float(w2_init)
     weight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1]=w1_init
     weight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1]=w2_init
     networkoutput, outputsequence, preoutputsequence=network.output(float(x), weight, bias)
-    Loss.append(float(0.5*(y-float(networkoutput))**2))
+    recorder.record(0, w1_current, w2_current, float(0.5*(y-float(networkoutput))**2))
     for i in range(N):
         #calculate the gradient with respect to current weight and bias#
         backprop=backpropagation(L=L, 
@@ -66,14 +68,15 @@ def plot_gd_trajectory(w1_init, w2_init, learningrate):
         delta=backprop.error(y)
         gradweight, gradbias=backprop.grad(x, delta)
         #update the weights and the loss values#
-        weight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1]=w_1[i]-learningrate*gradweight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1]
-        weight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1]=w_2[i]-learningrate*gradweight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1]
+        weight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1]=w1_current-learningrate*gradweight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1]
+        weight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1]=w2_current-learningrate*gradweight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1]
         networkoutput, outputsequence, preoutputsequence=network.output(float(x), weight, bias)
-        Loss.append(float(0.5*(y-float(networkoutput))**2))
-        w_1.append(weight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1])
-        w_2.append(weight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1])
+        w1_current=float(weight[weightindex_startlayer][weightindex_neuron_nextlayer[0]-1][weightindex_neuron_startlayer[0]-1])
+        w2_current=float(weight[weightindex_startlayer][weightindex_neuron_nextlayer[1]-1][weightindex_neuron_startlayer[1]-1])
+        if recorder.due(i+1):
+            recorder.record(i+1, w1_current, w2_current, float(0.5*(y-float(networkoutput))**2))
     
-    return w_1, w_2, Loss                          
+    return recorder["w_1"], recorder["w_2"], recorder["loss"]                          
 
 
 if __name__ == "__main__":
@@ -86,23 +89,6 @@ if __name__ == "__main__":
     print("Loss=", Loss)
 
 
-    fig = plt.figure()
-    ax=Axes3D(fig)
-    line=ax.plot([],[],'b:')
-    point=ax.plot([],[],'bo',markersize=10)
-    images=[]
-    def init():
-        line=ax.plot([],[],'b:',markersize=8)
-        point=ax.plot([],[],'bo',markersize=10)
-        return line,point
-    def anmi(i):
-        ax.clear()
-        line =ax.plot(w_1[0:i], w_2[0:i], Loss[0:i],'b:', markersize=8)
-        point = ax.plot(w_1[i-1:i], w_2[i-1:i], Loss[i-1:i],'bo', markersize=10)
-        return line,point
-    anim = animation.FuncAnimation(fig, anmi, init_func=init,
-                                   frames=N, interval=100, blit=False,repeat=False)
-    
-    anim.save('GDtrajectory'+'_n='+str(n)+'_activation='+str(sigma.name)+'_layer'+
+    save_animation(w_1, w_2, Loss, 'GDtrajectory'+'_n='+str(n)+'_activation='+str(sigma.name)+'_layer'+
               str(weightindex_startlayer)+'_neuron'+str(weightindex_neuron_startlayer[0])+str(weightindex_neuron_nextlayer[0])
-              +'_neuron'+str(weightindex_neuron_startlayer[1])+str(weightindex_neuron_nextlayer[1])+'.gif', writer='imagemagick')
+              +'_neuron'+str(weightindex_neuron_startlayer[1])+str(weightindex_neuron_nextlayer[1])+'.gif', interval=100, max_frames=max_frames, processes=animation_processes)
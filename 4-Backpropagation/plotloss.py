@@ -6,11 +6,10 @@ Created on Thu Jan 30 13:54:10 2020
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from activations import Sigmoid, ReLU, Tanh, Exponential
 from fullnetwork import onelayer, fullnetwork
-from mpl_toolkits.mplot3d import Axes3D 
+from render import render_all
 
 
 #number of hidden layers#
@@ -23,6 +22,8 @@ training_size=1
 N=3
 #activation function#
 sigma=Tanh() 
+#render the figure without showing it#
+headless=False
 
 #set the network#
 network=fullnetwork(L=L, n=n, activation=sigma)
@@ -69,17 +70,14 @@ def plot_network_loss():
 
 if __name__ == "__main__":
     a_1, a_2, Loss=plot_network_loss()
-    fig = plt.figure()
-    ax = Axes3D(fig)
     u=np.array(a_1)
     v=np.array(a_2)
     w=np.array(Loss)
     u, v = np.meshgrid(u, v)
-    ax.plot_surface(u, v, w, rstride=1, cstride=1, cmap='rainbow')
-    ax.set_title(str(sigma.name)+" empirical loss landscape with "+str(L)+" layers\n"+"Layer neuron numbers="+str(n))
-    ax.set_zlabel("Empirical Loss") 
-    ax.set_xlabel("w("+str(weightindex_startlayer)+")["+str(weightindex_neuron_startlayer[0])+"]["+str(weightindex_neuron_nextlayer[0])+"]")
-    ax.set_ylabel("w("+str(weightindex_startlayer)+")["+str(weightindex_neuron_startlayer[1])+"]["+str(weightindex_neuron_nextlayer[1])+"]")
-    plt.legend()    
-    plt.savefig(str(L)+"_HiddenLayerNN-Loss_"+str(sigma.name)+".jpg", bbox_inches='tight')
-    plt.show()
+    jobs=[("surface", dict(u=u, v=v, w=w, cmap='rainbow',
+                           title=str(sigma.name)+" empirical loss landscape with "+str(L)+" layers\n"+"Layer neuron numbers="+str(n),
+                           zlabel="Empirical Loss",
+                           xlabel="w("+str(weightindex_startlayer)+")["+str(weightindex_neuron_startlayer[0])+"]["+str(weightindex_neuron_nextlayer[0])+"]",
+                           ylabel="w("+str(weightindex_startlayer)+")["+str(weightindex_neuron_startlayer[1])+"]["+str(weightindex_neuron_nextlayer[1])+"]",
+                           filename=str(L)+"_HiddenLayerNN-Loss_"+str(sigma.name)+".jpg", savefig=dict(bbox_inches='tight')))]
+    render_all(jobs, headless=headless, processes=1)
@@ -0,0 +1,130 @@
+"""
+Training data sources for the stochastic optimizers
+
+a data source holds the samples (x_i, y_i), i=0,...,n-1, either as in-memory numpy arrays
+or as memory-mapped .npy files for data sets larger than the memory.
+It offers random access to mini-batches by their indices (take) and sequential passes
+over the whole data set in chunks (chunks, average), where the next chunks are read
+by a background thread while the current one is being evaluated.
+"""
+
+import queue
+import threading
+import numpy as np
+
+
+#an exception raised by the background reader, passed through the queue to be raised in the consuming thread
+class read_error(object):
+    def __init__(self, error):
+        self.error=error
+
+
+class data_source(object):
+    def __init__(self,
+                 x,
+                 y,
+                 chunksize=65536,
+                 prefetch=None):
+        """
+        x, y: the samples, arrays (or memory-mapped arrays) of equal length
+        chunksize: the number of samples of each chunk of a sequential pass
+        prefetch: the number of chunks read ahead by the background thread, 0 reads in the calling thread,
+                  None prefetches 2 chunks for memory-mapped samples and none for in-memory samples
+        """
+        if len(x)!=len(y):
+            raise ValueError("Number of samples x and y do not match!")
+        self.x=x
+        self.y=y
+        self.size=len(y)
+        self.chunksize=int(chunksize)
+        self.mapped=isinstance(x, np.memmap) or isinstance(y, np.memmap)
+        if prefetch is None:
+            prefetch=2 if self.mapped else 0
+        self.prefetch=prefetch
+
+    def __len__(self):
+        return self.size
+
+    #the samples of the given index, or of an array of indices (a mini-batch)
+    def take(self, indices):
+        if np.ndim(indices)==0 or not self.mapped:
+            return self.x[indices], self.y[indices]
+        #read the mapped file in increasing order of the indices, then put the samples back in the order drawn
+        indices=np.asarray(indices)
+        order=np.argsort(indices, kind='stable')
+        x=np.empty((len(indices),)+self.x.shape[1:], dtype=self.x.dtype)
+        y=np.empty((len(indices),)+self.y.shape[1:], dtype=self.y.dtype)
+        x[order]=self.x[indices[order]]
+        y[order]=self.y[indices[order]]
+        return x, y
+
+    #read the chunk starting at the given position into memory
+    def read(self, start):
+        stop=min(start+self.chunksize, self.size)
+        return start, np.array(self.x[start:stop]), np.array(self.y[start:stop])
+
+    #a sequential pass over the samples, yields (start, x_chunk, y_chunk)
+    def chunks(self):
+        starts=range(0, self.size, self.chunksize)
+        if self.prefetch<=0:
+            for start in starts:
+                yield self.read(start)
+            return
+        buffer=queue.Queue(maxsize=self.prefetch)
+        stop=threading.Event()
+        def reader():
+            #an error while reading is handed to the consumer, the end of the pass is always signalled
+            try:
+                for start in starts:
+                    if stop.is_set():
+                        return
+                    buffer.put(self.read(start))
+            except BaseException as error:
+                buffer.put(read_error(error))
+            finally:
+                buffer.put(None)
+        thread=threading.Thread(target=reader, daemon=True)
+        thread.start()
+        try:
+            while True:
+                chunk=buffer.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, read_error):
+                    raise chunk.error
+                yield chunk
+        finally:
+            #the pass may be left early, let the reader finish without blocking on the full buffer
+            stop.set()
+            while thread.is_alive():
+                try:
+                    buffer.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    #average of function(w, x_chunk, y_chunk) (loss values or gradients per sample) over all samples, in one sequential pass
+    def average(self, w, function):
+        total=0
+        for start, x, y in self.chunks():
+            total=total+np.sum(function(w, x, y), axis=0)
+        return total/self.size
+
+
+#the data source of in-memory arrays
+def array_source(x, y, chunksize=65536, prefetch=0):
+    return data_source(np.asarray(x), np.asarray(y), chunksize, prefetch)
+
+
+#the data source of the samples stored in the .npy files filename_x and filename_y, memory-mapped read-only
+def npy_source(filename_x, filename_y, chunksize=65536, prefetch=None):
+    return data_source(np.load(filename_x, mmap_mode='r'), np.load(filename_y, mmap_mode='r'), chunksize, prefetch)
+
+
+#store the samples as .npy files to be opened by npy_source, the samples are written chunk by chunk from any array-like of known shape
+def save_npy_source(filename_x, filename_y, x, y, chunksize=65536):
+    for filename, data in ((filename_x, x), (filename_y, y)):
+        out=np.lib.format.open_memmap(filename, mode='w+', dtype=np.asarray(data[:1]).dtype, shape=np.shape(data))
+        for start in range(0, len(data), chunksize):
+            out[start:start+chunksize]=data[start:start+chunksize]
+        out.flush()
+        del out
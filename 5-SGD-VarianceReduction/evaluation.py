@@ -0,0 +1,124 @@
+"""
+Evaluation schedules for the stochastic optimizers
+
+the training loss and the test error are evaluated only at the steps chosen by a schedule:
+(1) "every": every k-th step;
+(2) "geometric": geometrically spaced steps 0, 1, 2, ..., each at least growth times the previous one;
+(3) "time": the first step, then whenever at least the given number of seconds passed since the last evaluation.
+Instead of a full pass over the training samples, the training loss can be estimated by
+a running (exponential moving) average of the mini-batch losses of the steps.
+The evaluations can run on a background thread, overlapping the next optimization steps.
+"""
+
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class eval_schedule(object):
+    def __init__(self,
+                 scheme="every",
+                 every=1,
+                 growth=1.1,
+                 seconds=1.0):
+        """
+        scheme: "every", "geometric" or "time"
+        every: for "every", the spacing k of the evaluated steps
+        growth: for "geometric", the ratio between consecutive evaluated steps
+        seconds: for "time", the wall-clock time between evaluations
+        """
+        if scheme not in ("every", "geometric", "time"):
+            raise ValueError("unknown evaluation schedule "+str(scheme))
+        self.scheme=scheme
+        self.every=max(int(every), 1)
+        self.growth=growth
+        self.seconds=seconds
+        self.start()
+
+    #restart the schedule at step 0 of a new run
+    def start(self):
+        self.next=0
+        self.last_time=None
+
+    #whether the given step is evaluated, the steps of a run are asked in increasing order
+    def due(self, step):
+        if self.scheme=="every":
+            return step%self.every==0
+        if self.scheme=="geometric":
+            if step<self.next:
+                return False
+            self.next=max(step+1, int(math.ceil(step*self.growth)))
+            return True
+        now=time.perf_counter()
+        if self.last_time is None or now-self.last_time>=self.seconds:
+            self.last_time=now
+            return True
+        return False
+
+    #the number of evaluations in a run of the given number of steps, None if it is not known in advance
+    def capacity(self, iterations):
+        if self.scheme=="every":
+            return iterations//self.every+1
+        if self.scheme=="geometric":
+            count, step=0, 0
+            while step<iterations:
+                count+=1
+                step=max(step+1, int(math.ceil(step*self.growth)))
+            return count+1
+        return None
+
+
+#the exponential moving average of a sequence of values, e.g. the mini-batch losses
+class running_average(object):
+    def __init__(self, decay=0.99):
+        self.decay=decay
+        self.start()
+
+    def start(self):
+        self.value=None
+
+    def update(self, value):
+        if self.value is None:
+            self.value=value
+        else:
+            self.value=self.decay*self.value+(1-self.decay)*value
+        return self.value
+
+
+"""
+evaluate on a background thread and write the results into the recorder in the order of the steps
+evaluate(w, *arguments) returns the evaluated values for the weights w, it gets its own copy of w,
+write(recorder, step, w, *values) then writes the step with the given and the evaluated values into the recorder
+"""
+class background_evaluator(object):
+    def __init__(self, evaluate, write):
+        self.evaluate=evaluate
+        self.writer=write
+        self.executor=ThreadPoolExecutor(max_workers=1)
+        self.pending=deque()
+
+    #start the evaluation of the step, the finished evaluations at the head of the queue are written to the recorder
+    def submit(self, recorder, step, w, values=(), arguments=()):
+        w=w.copy()
+        self.pending.append((step, w, tuple(values), self.executor.submit(self.evaluate, w, *arguments)))
+        while self.pending and self.pending[0][3].done():
+            self.write(recorder)
+
+    def write(self, recorder):
+        step, w, values, future=self.pending.popleft()
+        self.writer(recorder, step, w, *(values+tuple(future.result())))
+
+    #wait for all the pending evaluations and write them to the recorder
+    def flush(self, recorder):
+        while self.pending:
+            self.write(recorder)
+
+    #wait for the evaluations not written yet and stop the thread, an exception raised by one of them is raised here
+    def close(self):
+        try:
+            for step, w, values, future in self.pending:
+                future.result()
+        finally:
+            self.pending.clear()
+            self.executor.shutdown(wait=True)
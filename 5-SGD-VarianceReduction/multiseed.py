@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-seed runs of the stochastic optimizers
+
+R independent seeds of SGD, SVRG and SARAH are run in a process pool.
+Every seed gets its own reproducible random streams, spawned from one base SeedSequence:
+one stream generates the training and test samples, the other one drives the index sampler.
+The same seed gives the same samples to every optimizer, so the optimizers are compared on paired data.
+The loss and test-error curves of all seeds are aggregated into mean and quantile arrays,
+saved as .npz files and plotted as mean curves with variance bands.
+Curves evaluated at different steps (e.g. a time-based schedule) are interpolated to the steps of the first seed.
+"""
+
+import numpy as np
+from multiprocessing import Pool
+
+from stochastic_optimizers import LossFunction, stochastic_optimizer
+from samplers import index_sampler
+from evaluation import eval_schedule, running_average
+from render import render_all
+
+import datetime
+starttime = datetime.datetime.now()
+
+#the optimizers to compare, the number of seeds R, the base seed and the number of worker processes (None uses all cores)
+optnames=("SGD", "SVRG", "SARAH")
+num_seeds=16
+base_seed=0
+processes=None
+#the lower and upper quantiles of the variance bands
+quantiles=(0.1, 0.9)
+#the parameters of the runs, see stochastic_optimizers.py
+settings=dict(A=1,
+              B=1,
+              training_sample_size=100,
+              test_sample_size=1000,
+              w_init=[1, 1],
+              lr=0.01,
+              num_steps=1000,
+              batchsize=1,
+              num_epochs=100,
+              epochlength=10,
+              inner_batchsize=1,
+              sampling="shuffle",
+              backend="numpy",
+              record_every=1,
+              eval_scheme="every",
+              eval_growth=1.1,
+              eval_seconds=1.0,
+              running_loss_decay=None)
+#render the figures without showing them, in render_processes worker processes (None uses all cores)
+headless=False
+render_processes=None
+
+
+"""
+run one seed of one optimizer, in a worker process
+args=(optname, seed_sequence, settings), the seed_sequence is spawned into the data stream and the sampler stream
+return the loss and the test error curves and the evaluated steps
+"""
+def run_seed(args):
+    optname, seed_sequence, settings=args
+    data_seed, sampler_seed=seed_sequence.spawn(2)
+    rng=np.random.default_rng(data_seed)
+    n=settings["training_sample_size"]
+    #generate the training samples (x_i, y_i) and the held-out test samples (x, y) of this seed
+    training_sample_x=rng.normal(0,1,size=(n, 2))
+    training_sample_y=rng.normal(0,1,size=n)
+    test_sample_x=rng.normal(0,1,size=(settings["test_sample_size"], 2))
+    test_sample_y=rng.normal(0,1,size=settings["test_sample_size"])
+    function=LossFunction(axA=settings["A"], axB=settings["B"], backend=settings["backend"])
+    optimizer=stochastic_optimizer(function=function,
+                                   training_sample_x=training_sample_x,
+                                   training_sample_y=training_sample_y,
+                                   test_sample_x=test_sample_x,
+                                   test_sample_y=test_sample_y,
+                                   record_every=settings["record_every"],
+                                   sampler=index_sampler(n, settings["sampling"], seed=sampler_seed),
+                                   schedule=eval_schedule(settings["eval_scheme"], every=settings["record_every"],
+                                                          growth=settings["eval_growth"], seconds=settings["eval_seconds"]),
+                                   running_loss=None if settings["running_loss_decay"] is None else running_average(settings["running_loss_decay"]))
+    trajectory_w, loss, test_error, steps=optimizer.run(optname, settings["w_init"], settings["lr"],
+                                                        settings["num_steps"], settings["num_epochs"], settings["epochlength"],
+                                                        settings["batchsize"], settings["inner_batchsize"])
+    return loss, test_error, steps
+
+
+#the mean and the quantiles over the seeds of a list of curves (steps, values), interpolated to the given steps, quantiles has shape (len(q), len(steps))
+def aggregate(curves, steps, q=(0.1, 0.9)):
+    curves=np.stack([values if np.array_equal(curve_steps, steps) else np.interp(steps, curve_steps, values) for curve_steps, values in curves])
+    return dict(mean=np.mean(curves, axis=0), quantiles=np.quantile(curves, q, axis=0), curves=curves)
+
+
+"""
+run num_seeds seeds of every optimizer in a pool of processes
+return for each optimizer name a dict with the recorded steps and the aggregated loss and test error
+"""
+def run_seeds(optnames, num_seeds, settings, base_seed=0, q=(0.1, 0.9), processes=None):
+    seed_sequences=np.random.SeedSequence(base_seed).spawn(num_seeds)
+    tasks=[(optname, seed_sequence, settings) for optname in optnames for seed_sequence in seed_sequences]
+    with Pool(processes) as pool:
+        outputs=pool.map(run_seed, tasks, chunksize=1)
+    results={}
+    for k, optname in enumerate(optnames):
+        runs=outputs[k*num_seeds:(k+1)*num_seeds]
+        steps=runs[0][2]
+        loss=aggregate([(run[2], run[0]) for run in runs], steps, q)
+        test_error=aggregate([(run[2], run[1]) for run in runs], steps, q)
+        results[optname]=dict(steps=steps, loss=loss, test_error=test_error)
+    return results
+
+
+if __name__ == "__main__":
+    results=run_seeds(optnames, num_seeds, settings, base_seed, quantiles, processes)
+    jobs=[]
+    for optname in optnames:
+        result=results[optname]
+        name=optname+'_A='+str(settings["A"])+'_B='+str(settings["B"])+'_trainingsize='+str(settings["training_sample_size"])+'_learningrate='+str(settings["lr"])+'_seeds='+str(num_seeds)
+        #save the aggregated curves
+        np.savez('MultiSeed_'+name+'.npz', steps=result["steps"], quantiles=np.array(quantiles),
+                 loss_mean=result["loss"]["mean"], loss_quantiles=result["loss"]["quantiles"],
+                 test_error_mean=result["test_error"]["mean"], test_error_quantiles=result["test_error"]["quantiles"])
+        print(optname, "final loss=", result["loss"]["mean"][-1], "final test error=", result["test_error"]["mean"][-1])
+        #the mean curves with the bands between the lower and the upper quantile
+        xlabel='epoch' if optname in ("SVRG", "SARAH") else 'iteration'
+        for key, ylabel, prefix in (("loss", 'loss', 'Loss_'), ("test_error", 'test error', 'TestError_')):
+            lower, upper=result[key]["quantiles"][0], result[key]["quantiles"][-1]
+            jobs.append(("bands", dict(lines=[(result["steps"], result[key]["mean"], lower, upper)], xlabel=xlabel, ylabel=ylabel,
+                                       title=optname+', mean and '+str(quantiles[0])+'-'+str(quantiles[-1])+' quantiles over '+str(num_seeds)+' seeds',
+                                       filename=prefix+'MultiSeed_'+name+'.jpg')))
+    render_all(jobs, headless=headless, processes=render_processes)
+
+    endtime = datetime.datetime.now()
+    print("running time:", (endtime-starttime).seconds, "seconds.")
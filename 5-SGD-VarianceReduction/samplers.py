@@ -0,0 +1,108 @@
+"""
+Index samplers for the stochastic optimizers
+
+the random indices of the training samples are pre-generated in large blocks from a seeded numpy Generator,
+instead of building the list [0,...,n-1] and calling random.sample or random.choice at every step,
+the mini-batches are then gathered by fancy indexing the training arrays with the drawn indices.
+Three schemes:
+(1) "replacement": i.i.d. uniform indices;
+(2) "shuffle": without replacement, each epoch is a fresh random permutation of [0,...,n-1],
+    a batch crossing the end of an epoch is completed by the first indices of the next permutation that are not in it yet;
+(3) "stratified": every batch draws from each stratum in proportion to its size.
+"""
+
+import numpy as np
+
+
+class index_sampler(object):
+    def __init__(self,
+                 size,
+                 scheme="replacement",
+                 seed=None,
+                 blocksize=65536,
+                 strata=None,
+                 num_strata=10):
+        """
+        size: the number of training samples n
+        scheme: "replacement", "shuffle" or "stratified"
+        seed: the seed of the numpy Generator (an int, a SeedSequence or a Generator)
+        blocksize: the number of indices generated at once for "replacement"
+        strata: for "stratified", the stratum label of every sample, by default [0,...,n-1] is cut into num_strata contiguous strata
+        """
+        self.size=size
+        self.scheme=scheme
+        self.rng=seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.blocksize=blocksize
+        self.block=np.empty(0, dtype='int64')
+        self.position=0
+        if scheme=="stratified":
+            if strata is None:
+                strata=np.arange(size)*min(num_strata, size)//size
+            strata=np.unique(strata, return_inverse=True)[1]
+            order=np.argsort(strata, kind='stable')
+            self.groups=np.split(order, np.cumsum(np.bincount(strata))[:-1])
+            self.proportions=np.array([len(group) for group in self.groups])/size
+            #within each stratum the positions are drawn by a sampler with replacement on its own stream
+            seeds=self.rng.integers(0, 2**63, size=len(self.groups))
+            self.substreams=[index_sampler(len(group), "replacement", seed=int(seed), blocksize=blocksize)
+                             for group, seed in zip(self.groups, seeds)]
+        elif scheme not in ("replacement", "shuffle"):
+            raise ValueError("unknown sampling scheme "+str(scheme))
+
+    #generate the next block of indices
+    def refill(self):
+        if self.scheme=="replacement":
+            self.block=self.rng.integers(0, self.size, size=self.blocksize)
+        else:
+            self.block=self.rng.permutation(self.size)
+        self.position=0
+
+    #the number of samples taken from each stratum in a batch: proportional allocation, the remainder goes to randomly picked strata
+    def allocation(self, batchsize):
+        counts=np.floor(batchsize*self.proportions).astype('int64')
+        remainder=batchsize-counts.sum()
+        if remainder>0:
+            counts+=np.bincount(self.rng.choice(len(self.groups), size=remainder, replace=False, p=self.proportions), minlength=len(self.groups))
+        return counts
+
+    #draw the indices of a mini-batch of the given size
+    def draw(self, batchsize):
+        if self.scheme=="stratified":
+            counts=self.allocation(batchsize)
+            return np.concatenate([group[stream.draw(count)] for group, stream, count in zip(self.groups, self.substreams, counts) if count>0])
+        if self.position+batchsize<=len(self.block):
+            batch=self.block[self.position:self.position+batchsize]
+            self.position+=batchsize
+            return batch
+        if self.scheme=="shuffle":
+            return self.draw_across_epochs(batchsize)
+        parts=[]
+        needed=batchsize
+        while needed>0:
+            if self.position==len(self.block):
+                self.refill()
+            part=self.block[self.position:self.position+needed]
+            self.position+=len(part)
+            needed-=len(part)
+            parts.append(part)
+        return np.concatenate(parts)
+
+    #a "shuffle" batch that crosses the end of the permutation: the rest of the epoch, then indices of the next epoch not in the batch yet,
+    #which are moved to the front of the new permutation so that it still holds every index once
+    def draw_across_epochs(self, batchsize):
+        if batchsize>self.size:
+            raise ValueError("a batch of "+str(batchsize)+" distinct indices is larger than the "+str(self.size)+" samples")
+        head=self.block[self.position:]
+        needed=batchsize-len(head)
+        self.refill()
+        fresh=~np.isin(self.block, head)
+        positions=np.flatnonzero(fresh)[:needed]
+        taken=np.zeros(self.size, dtype=bool)
+        taken[positions]=True
+        self.block=np.concatenate([self.block[taken], self.block[~taken]])
+        self.position=needed
+        return np.concatenate([head, self.block[:needed]])
+
+    #draw one index
+    def index(self):
+        return int(self.draw(1)[0])
@@ -6,35 +6,64 @@ Created on Sun Mar 29 16:44:22 2020
 @author: Wenqing Hu (Missouri S&T)
 """
 
-#SGD, SVRG and SARAH for quadratic loss and Gaussian input data
+#SGD, SVRG, SARAH, SAGA and SAG for quadratic loss and Gaussian input data
 #tensorflow version=1.14.0
 
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib import animation
-from random import sample, choice
+from recorder import trajectory_recorder
+from samplers import index_sampler
+from datasource import array_source, npy_source
+from evaluation import eval_schedule, running_average, background_evaluator
+from render import render_all
 
 import datetime
-starttime = datetime.datetime.now()
-
-import tensorflow as tf
-tf.enable_eager_execution()
 
 #set the parameters A, B for the loss function
 A=1
 B=1
-#set the training sample size and the batchsize
+#set the training sample size, the held-out test sample size and the batchsize
 training_sample_size=100
+test_sample_size=1000
+#read the training samples from the .npy files (filename_x, filename_y), memory-mapped, instead of generating them (None)
+training_files=None
 batchsize=1
-#for SGD, set the number of iteration steps
+#for SGD, SAGA and SAG, set the number of iteration steps
 num_steps=1000
-#for SVRG, set the number of epochs and epochlength (m)
+#for SVRG and SARAH, set the number of epochs, the epochlength (m) and the batchsize of the inner loop
+#epochlength=None makes one epoch a pass over the training samples, i.e. training_sample_size//inner_batchsize inner steps
 num_epochs=100
 epochlength=10
+inner_batchsize=1
 #set the learning rate
 lr=0.01
+#the sampling scheme of the training indices ("replacement", "shuffle" or "stratified") and the seed of the random generator
+sampling="shuffle"
+seed=None
+#calculate the gradients in closed form with "numpy", or via automatic differentiation with "tf"
+backend="numpy"
+#record every k-th iteration of the trajectory, loss and test error
+record_every=1
+#the evaluation schedule of the loss and test error: "every" (record_every), "geometric" (eval_growth) or "time" (eval_seconds)
+eval_scheme="every"
+eval_growth=1.1
+eval_seconds=1.0
+#estimate the training loss by a running average of the mini-batch losses with this decay instead of full passes (None: full passes)
+running_loss_decay=None
+#evaluate the loss and test error on a background thread, overlapping the next steps
+background_eval=False
+#export at most max_frames frames of the animation (None keeps all), rendered by animation_processes worker processes
+max_frames=None
+animation_processes=1
+#render the figures without showing them, in render_processes worker processes (None uses all cores)
+headless=False
+render_processes=None
+
+#tensorflow in eager mode, imported on the first use of the backend "tf" so that importing this module stays cheap
+def tensorflow():
+    import tensorflow as tf
+    if not tf.executing_eagerly():
+        tf.compat.v1.enable_eager_execution()
+    return tf
 
 #a small tool function, calculate the length of sample_x and sample_y, they should be equal
 def size(sample_x, sample_y):
@@ -48,69 +77,255 @@ def size(sample_x, sample_y):
 """
 Loss Function L(w_1, w_2; (x_1, x_2, y)) = 0.5(Aw_1x_1+Bw_2x_2-y)^2 for A, B>0
 and its gradients with respect to the weight parameters w_1 and w_2
-the gradients are calculated via the tf.GradientTape() mode
+the gradients are calculated in closed form with numpy (backend="numpy") or via the tf.GradientTape() mode (backend="tf")
+x can be one sample (x_1, x_2) or a (batch, 2) array of samples with y of shape (batch,),
+the results are then per-sample, or averaged over the batch with mean=True
 """
 class LossFunction(object):
     def __init__(self,
                  axA,
-                 axB):
+                 axB,
+                 backend="tf",
+                 chunksize=65536):      #number of samples evaluated at once in average
         self.axA=axA
         self.axB=axB
+        self.backend=backend
+        self.chunksize=chunksize
     
     #value of the loss function    
-    def value(self, w, x, y):
-        return 0.5*(self.axA*w[0]*x[0]+self.axB*w[1]*x[1]-y)**2
+    def value(self, w, x, y, mean=False):
+        x=np.asarray(x)
+        value=0.5*(self.axA*w[0]*x[...,0]+self.axB*w[1]*x[...,1]-y)**2
+        return np.mean(value, axis=0) if mean and x.ndim==2 else value
     
     #gradient of the loss function with respect to the weights (w_1, w_2)
-    def grad(self, w, x, y):
-        tfw_1=tf.Variable(initial_value=w[0], dtype='float')
-        tfw_2=tf.Variable(initial_value=w[1], dtype='float')
+    def grad(self, w, x, y, mean=False):
+        if self.backend=="numpy":
+            grad=self.numpy_grad(w, x, y)
+        else:
+            grad=self.tf_grad(w, x, y)
+        return np.mean(grad, axis=0) if mean and np.ndim(x)==2 else grad
+    
+    #the residual r = Aw_1x_1+Bw_2x_2-y of the linear model, one scalar per sample
+    def residual(self, w, x, y):
+        x=np.asarray(x)
+        return self.axA*w[0]*x[...,0]+self.axB*w[1]*x[...,1]-y
+    
+    #the gradient (A x_1 r, B x_2 r) rebuilt from the residual r, the per-sample gradient only depends on w through r
+    def residual_grad(self, residual, x):
+        x=np.asarray(x)
+        return np.stack([self.axA*x[...,0]*residual, self.axB*x[...,1]*residual], axis=-1)
+    
+    #the closed form gradient (A x_1 r, B x_2 r) with the residual r = Aw_1x_1+Bw_2x_2-y
+    def numpy_grad(self, w, x, y):
+        return self.residual_grad(self.residual(w, x, y), x)
+    
+    #the gradient via tf.GradientTape(), each sample gets its own copy of (w_1, w_2) so that one tape gives all per-sample gradients
+    def tf_grad(self, w, x, y):
+        tf=tensorflow()
+        x=np.asarray(x, dtype='float32')
+        y=np.asarray(y, dtype='float32')
+        tfw_1=tf.Variable(initial_value=np.full(y.shape, w[0], dtype='float32'), dtype='float')
+        tfw_2=tf.Variable(initial_value=np.full(y.shape, w[1], dtype='float32'), dtype='float')
         with tf.GradientTape() as tape:
-            loss=0.5*tf.math.square(tf.subtract(tf.add(tf.multiply(tf.multiply(self.axA, tfw_1), x[0]), tf.multiply(tf.multiply(self.axB, tfw_2), x[1])), y))
+            loss=0.5*tf.math.square(tf.subtract(tf.add(tf.multiply(tf.multiply(self.axA, tfw_1), x[...,0]), tf.multiply(tf.multiply(self.axB, tfw_2), x[...,1])), y))
         grad_w_1, grad_w_2=tape.gradient(loss, [tfw_1, tfw_2])
-        return np.array([grad_w_1.numpy(), grad_w_2.numpy()])
+        return np.stack([grad_w_1.numpy(), grad_w_2.numpy()], axis=-1)
     
     #average of a sequence of function=loss functions/loss gradients for a given list of samples (x_i, y_i)
+    #each chunk of at most chunksize samples is evaluated in one vectorized call, so the memory stays bounded for huge sample sizes
     def average(self, w, sample_x, sample_y, function):
-        average=function(w, sample_x[0], sample_y[0])
         sample_size=size(sample_x, sample_y)
-        for i in range(sample_size-1):
-            average+=function(w, sample_x[i+1], sample_y[i+1])
-        average=average/sample_size
-        return average
+        total=0
+        for start in range(0, sample_size, self.chunksize):
+            total=total+np.sum(function(w, sample_x[start:start+self.chunksize], sample_y[start:start+self.chunksize]), axis=0)
+        return total/sample_size
    
     
 """
-The stochastic optimizer for: SGD, SVRG, SARAH
+The SVRG snapshot of an epoch: the checkpoint weights w_checkpoint (the w-tilde) and the full gradient
+of the empirical loss at the checkpoint (the mu-tilde), calculated once when the epoch starts
+for linear models the per-sample gradients at the checkpoint can be stored too (store_sample_grads=True),
+then the inner loop only evaluates one new gradient per step
+the training samples are given as a data_source
+"""
+class SVRG_snapshot(object):
+    def __init__(self,
+                 function,
+                 w_checkpoint,
+                 data,
+                 store_sample_grads=False):
+        self.function=function
+        self.w_checkpoint=w_checkpoint
+        self.data=data
+        if store_sample_grads:
+            #fill the table of per-sample gradients chunk by chunk, the full gradient is its mean
+            self.sample_grads=np.empty((data.size, len(w_checkpoint)))
+            for start, x, y in data.chunks():
+                self.sample_grads[start:start+len(y)]=function.grad(w_checkpoint, x, y)
+            self.grad=np.mean(self.sample_grads, axis=0)
+        else:
+            self.sample_grads=None
+            self.grad=data.average(w_checkpoint, function.grad)
+    
+    #the gradient of the loss at the checkpoint for the training sample of the given index
+    def sample_grad(self, index):
+        if self.sample_grads is not None:
+            return self.sample_grads[index]
+        x, y=self.data.take(index)
+        return self.function.grad(self.w_checkpoint, x, y)
+    
+    #the gradient of the loss at the checkpoint averaged over the mini-batch of the given indices
+    def batch_grad(self, batch_index):
+        if self.sample_grads is not None:
+            return np.mean(self.sample_grads[batch_index], axis=0)
+        x, y=self.data.take(batch_index)
+        return self.function.grad(self.w_checkpoint, x, y, mean=True)
+
+
+"""
+The table of the last evaluated per-sample gradients for SAG and SAGA, filled at w_init and kept with its mean
+for the linear model LossFunction (compact=True) only the scalar residual of each sample is stored, O(n) memory,
+and the gradient of sample i is rebuilt from its residual and x_i; otherwise the full (n, d) gradients are stored
+the training samples are given as a data_source
+"""
+class gradient_table(object):
+    def __init__(self,
+                 function,
+                 w_init,
+                 data,
+                 compact=None):         #None: compact whenever the function provides residual and residual_grad
+        self.function=function
+        self.data=data
+        if compact is None:
+            compact=hasattr(function, "residual") and hasattr(function, "residual_grad")
+        self.compact=compact
+        self.sample_size=data.size
+        if compact:
+            self.table=np.empty(self.sample_size)
+            evaluate=function.residual
+        else:
+            self.table=np.empty((self.sample_size, len(w_init)))
+            evaluate=function.grad
+        #fill the table chunk by chunk and sum up the gradients for their mean
+        total=0
+        for start, x, y in data.chunks():
+            entries=evaluate(w_init, x, y)
+            self.table[start:start+len(y)]=entries
+            total=total+np.sum(self.entry_grad(entries, x), axis=0)
+        self.mean=total/self.sample_size
+    
+    #the gradients of the given table entries
+    def entry_grad(self, entries, x):
+        if self.compact:
+            return self.function.residual_grad(entries, x)
+        return entries
+    
+    #the stored gradient of the training sample of the given index
+    def grad(self, index):
+        return self.entry_grad(self.table[index], self.data.take(index)[0])
+    
+    #evaluate the gradient of the sample at w, store it and update the mean in O(d), return the new and the replaced gradient
+    def replace(self, index, w):
+        x, y=self.data.take(index)
+        #a full table row is a view, copy it before the row is overwritten
+        old_grad=np.array(self.entry_grad(self.table[index], x))
+        if self.compact:
+            self.table[index]=self.function.residual(w, x, y)
+        else:
+            self.table[index]=self.function.grad(w, x, y)
+        new_grad=self.entry_grad(self.table[index], x)
+        self.mean=self.mean+(new_grad-old_grad)/self.sample_size
+        return new_grad, old_grad
+
+
+"""
+The stochastic optimizer for: SGD, SVRG, SARAH, SAGA, SAG
 first create the updates for each iteration, then optimizes via different schemes of iteration loop
 """
 class stochastic_optimizer(object):
     def __init__(self, 
                  function,              #the loss function class (contains grad info)
-                 training_sample_x,     #training and test samples
+                 training_sample_x,     #training and test samples, the test samples can be one sample (x, y) or a set of samples
                  training_sample_y,     
                  test_sample_x, 
-                 test_sample_y):
+                 test_sample_y,
+                 record_every=1,        #record every k-th iteration only
+                 sampler=None,          #the index sampler of the training samples, by default without replacement ("shuffle")
+                 training_data=None,    #the training samples as a data_source (e.g. memory-mapped .npy files), replaces training_sample_x/y
+                 schedule=None,         #the eval_schedule of the evaluations, by default every record_every-th iteration
+                 running_loss=None,     #a running_average of the mini-batch losses estimating the training loss, None: full passes
+                 test_data=None,        #the test samples as a data_source, replaces test_sample_x/y
+                 background=False):     #evaluate on a background thread
         self.function=function
-        self.training_sample_x=training_sample_x
-        self.training_sample_y=training_sample_y
-        self.test_sample_x=test_sample_x
-        self.test_sample_y=test_sample_y
+        if training_data is None:
+            training_data=array_source(training_sample_x, training_sample_y, chunksize=getattr(function, "chunksize", 65536))
+        self.training_data=training_data
+        if test_data is None:
+            test_data=array_source(np.atleast_2d(test_sample_x), np.reshape(test_sample_y, -1), chunksize=getattr(function, "chunksize", 65536))
+        self.test_data=test_data
+        self.record_every=record_every
+        if sampler is None:
+            sampler=index_sampler(training_data.size, "shuffle")
+        self.sampler=sampler
+        if schedule is None:
+            schedule=eval_schedule("every", every=record_every)
+        self.schedule=schedule
+        self.running_loss=running_loss
+        self.background=background
+        self.evaluator=None
+    
+    #the recorder of the weights trajectory, training error (loss) and test error for a run of given number of iterations
+    #the evaluation schedule and the running loss restart with the run
+    def recorder(self, iterations):
+        self.schedule.start()
+        if self.running_loss is not None:
+            self.running_loss.start()
+        if self.background and self.evaluator is None:
+            self.evaluator=background_evaluator(self.evaluate, self.write)
+        return trajectory_recorder(fields=("w_1", "w_2", "loss", "test_error"), capacity=self.schedule.capacity(iterations))
+    
+    #add the mini-batch loss at w of the samples (x, y) of a step to the running loss
+    def observe(self, w, x, y):
+        if self.running_loss is not None:
+            self.running_loss.update(float(np.squeeze(self.function.value(w, x, y, mean=True))))
+    
+    #the training error (loss) and the test error (the mean loss over the test samples, evaluated chunk by chunk) for the model weights w
+    #with full_loss=False the loss is not evaluated (None)
+    def evaluate(self, w, full_loss=True):
+        test_error=float(np.squeeze(self.test_data.average(w, self.function.value)))
+        if not full_loss:
+            return None, test_error
+        return float(np.squeeze(self.training_data.average(w, self.function.value))), test_error
+    
+    #record the current model weights w, the training error (loss) and the test error for the current model weights w
+    #the loss is the running average of the mini-batch losses if there is one, otherwise a full pass over the training samples
+    def record(self, recorder, step, w):
+        w=np.asarray(w, dtype='float64')
+        running=None if self.running_loss is None else self.running_loss.value
+        if self.evaluator is not None:
+            self.evaluator.submit(recorder, step, w, values=(running,), arguments=(running is None,))
+        else:
+            self.write(recorder, step, w, running, *self.evaluate(w, running is None))
+    
+    #write the evaluated values of the step into the recorder
+    def write(self, recorder, step, w, running, loss, test_error):
+        recorder.record(step, w[0], w[1], running if loss is None else loss, test_error)
+    
+    #unpack the recorder into the weights trajectory (an array of rows w), the loss and the test error sequences and the evaluated steps
+    #the pending background evaluations are finished first
+    def results(self, recorder):
+        if self.evaluator is not None:
+            self.evaluator.flush(recorder)
+        return np.column_stack([recorder["w_1"], recorder["w_2"]]), recorder["loss"], recorder["test_error"], recorder.steps()
     
     #the SGD estimator update = the change of parameter via stochastic gradients    
     def SGD_update(self, w, lr, batchsize):
-        #detect the size of the training set
-        trainingsize=size(self.training_sample_x, self.training_sample_y)
         #randomly choose the index set that forms the mini-batch
-        batch_index=sample(list(range(0,trainingsize)), batchsize)
+        batch_index=self.sampler.draw(batchsize)
         #from the mini-batch index set select the corresponding training samples (x, y)
-        batch_x=[]
-        batch_y=[]
-        for i in range(batchsize):
-            batch_x.append(self.training_sample_x[batch_index[i]])
-            batch_y.append(self.training_sample_y[batch_index[i]])
-        batch_x=np.array(batch_x)
-        batch_y=np.array(batch_y)
+        batch_x, batch_y=self.training_data.take(batch_index)
+        self.observe(w, batch_x, batch_y)
         #calculate the stochastic gradient updates 
         grad=self.function.average(w, batch_x, batch_y, self.function.grad)
         update=-lr*grad
@@ -119,106 +334,193 @@ class stochastic_optimizer(object):
     #the SGD optimizer, iterates a certain number of steps to update the weights
     def SGD_optimizer(self, w_init, steps, lr, batchsize):
         w_current=w_init
-        trajectory_w=[]
-        loss_list=[]
-        test_error_list=[]
+        recorder=self.recorder(steps)
         for i in range(steps):
-            #record the current model weights w 
-            trajectory_w.append(w_current) 
-            #calculate the test error for the current model weights w
-            test_error=self.function.value(w_current, self.test_sample_x, self.test_sample_y)
-            test_error_list.append(test_error)
-            #calculate the training error (loss) for the current model weights w
-            loss_list.append(self.function.average(w_current, self.training_sample_x, self.training_sample_y, self.function.value))
+            #record the current model weights w, its training error (loss) and test error
+            if self.schedule.due(i):
+                self.record(recorder, i, w_current)
             #update w via stochastic optimization
             w=w_current+self.SGD_update(w_current, lr, batchsize)
             w_current=w
-        return trajectory_w, loss_list, test_error_list
+        return self.results(recorder)
 
+    #the number of inner steps of an epoch, None: one pass over the training samples with the given batchsize
+    def epoch_steps(self, epochlength, batchsize):
+        if epochlength is None:
+            return max(self.training_data.size//batchsize, 1)
+        return epochlength
+    
     #the SVRG estimator update = the inner loop update via variance-reduced stochastic gradients
-    # w_checkpoint is the checkpoint w value recorded, i.e., the w-tilde in the Algorithm in the SVRG paper (Johnson-Zhang, NIPS 2013)
-    def SVRG_update(self, w, lr, w_checkpoint):
-        #grad_checkpoint is the gradient value of the empirical loss at the checkpoint, i.e., the mu-tilde
-        grad_checkpoint=self.function.average(w_checkpoint, self.training_sample_x, self.training_sample_y, self.function.grad)
-        #sample one random index from the set [0,...,training_size-1]
-        trainingsize=size(self.training_sample_x, self.training_sample_y)
-        index=choice(list(range(0,trainingsize)))
-        #return the variance-reduced stochastic gradient
-        grad_1 = self.function.grad(w, self.training_sample_x[index], self.training_sample_y[index])
-        grad_2 = self.function.grad(w_checkpoint, self.training_sample_x[index], self.training_sample_y[index])
-        grad = grad_1 - grad_2 + grad_checkpoint
+    # snapshot holds the checkpoint w value recorded, i.e., the w-tilde in the Algorithm in the SVRG paper (Johnson-Zhang, NIPS 2013)
+    # and the gradient value of the empirical loss at the checkpoint, i.e., the mu-tilde, calculated once per epoch
+    # with batchsize>1 both gradients are averaged over a mini-batch evaluated in one vectorized call
+    def SVRG_update(self, w, lr, snapshot, batchsize=1):
+        if batchsize==1:
+            #sample one random index from the set [0,...,training_size-1]
+            index=self.sampler.index()
+            #return the variance-reduced stochastic gradient
+            x, y=self.training_data.take(index)
+            self.observe(w, x, y)
+            grad_1 = self.function.grad(w, x, y)
+            grad_2 = snapshot.sample_grad(index)
+        else:
+            #randomly choose the index set that forms the mini-batch
+            batch_index=self.sampler.draw(batchsize)
+            batch_x, batch_y=self.training_data.take(batch_index)
+            self.observe(w, batch_x, batch_y)
+            grad_1 = self.function.grad(w, batch_x, batch_y, mean=True)
+            grad_2 = snapshot.batch_grad(batch_index)
+        grad = grad_1 - grad_2 + snapshot.grad
         update = -lr*grad
         return update
     
     #the SVRG optimizer, iterates a certain number of epochs, with each epoch under a cetain length (epochlength=m), to get the updated weights
-    def SVRG_optimizer(self, w_init, epochs, epochlength, lr):
+    # store_sample_grads=True keeps the per-sample gradients at the checkpoint (for linear models, n gradients of memory)
+    # batchsize: the mini-batch size of the inner loop, epochlength=None gives training_size//batchsize inner steps
+    def SVRG_optimizer(self, w_init, epochs, epochlength, lr, store_sample_grads=False, batchsize=1):
+        epochlength=self.epoch_steps(epochlength, batchsize)
         w_checkpoint=w_init
-        trajectory_w=[]
-        loss_list=[]
-        test_error_list=[]
+        recorder=self.recorder(epochs)
         for s in range(epochs):
-            #record the current model weights w 
-            trajectory_w.append(w_checkpoint) 
-            #calculate the test error for the current model weights w
-            test_error=self.function.value(w_checkpoint, self.test_sample_x, self.test_sample_y)
-            test_error_list.append(test_error)
-            #calculate the training error (loss) for the current model weights w
-            loss_list.append(self.function.average(w_checkpoint, self.training_sample_x, self.training_sample_y, self.function.value))
+            #record the current model weights w, its training error (loss) and test error
+            if self.schedule.due(s):
+                self.record(recorder, s, w_checkpoint)
             #the inner loop list of w is initialized, will fill in w_1,...,w_m (m=epochlength)
             w_innerloop_list=[]
-            #start the inner loop at w_checkpoint
+            #take the snapshot of the epoch at w_checkpoint, then start the inner loop there
+            snapshot=SVRG_snapshot(self.function, w_checkpoint, self.training_data, store_sample_grads)
             w_current=w_checkpoint
             for i in range(epochlength):
-                w_next = w_current + self.SVRG_update(w_current, lr, w_checkpoint)
+                w_next = w_current + self.SVRG_update(w_current, lr, snapshot, batchsize)
                 w_innerloop_list.append(w_next)
                 w_current=w_next
             #update the checkpoint by randomly select from the list in the inner loop w_1,...,w_m (m=epochlength)
-            w_checkpoint=choice(list(w_innerloop_list))
-        return trajectory_w, loss_list, test_error_list
+            w_checkpoint=w_innerloop_list[self.sampler.rng.integers(len(w_innerloop_list))]
+        return self.results(recorder)
     
     #the SARAH estimator update = the inner loop update via variance-reduced stochastic gradients
-    def SARAH_update(self, w_current, w_previous, lr, update_previous):
-        #sample one random index from the set [0,...,training_size-1]
-        trainingsize=size(self.training_sample_x, self.training_sample_y)
-        index=choice(list(range(0,trainingsize)))
-        #return the SARAH version of the variance-reduced stochastic gradient
-        grad_1 = self.function.grad(w_current, self.training_sample_x[index], self.training_sample_y[index])
-        grad_2 = self.function.grad(w_previous, self.training_sample_x[index], self.training_sample_y[index])
+    # with batchsize>1 the gradient difference is averaged over a mini-batch evaluated in one vectorized call
+    def SARAH_update(self, w_current, w_previous, lr, update_previous, batchsize=1):
+        if batchsize==1:
+            #sample one random index from the set [0,...,training_size-1]
+            index=self.sampler.index()
+            #return the SARAH version of the variance-reduced stochastic gradient
+            x, y=self.training_data.take(index)
+            self.observe(w_current, x, y)
+            grad_1 = self.function.grad(w_current, x, y)
+            grad_2 = self.function.grad(w_previous, x, y)
+        else:
+            #randomly choose the index set that forms the mini-batch, the same batch at w_current and w_previous
+            batch_index=self.sampler.draw(batchsize)
+            batch_x, batch_y=self.training_data.take(batch_index)
+            self.observe(w_current, batch_x, batch_y)
+            grad_1 = self.function.grad(w_current, batch_x, batch_y, mean=True)
+            grad_2 = self.function.grad(w_previous, batch_x, batch_y, mean=True)
         grad = grad_1 - grad_2 
         update = - lr*grad + update_previous
         return update
     
     #the SARAH optimizer, iterates a certain number of epochs, with each epoch under a cetain length (epochlength=m), to get the updated weights
-    def SARAH_optimizer(self, w_init, epochs, epochlength, lr):
+    # batchsize: the mini-batch size of the inner loop, epochlength=None gives training_size//batchsize inner steps
+    def SARAH_optimizer(self, w_init, epochs, epochlength, lr, batchsize=1):
+        epochlength=self.epoch_steps(epochlength, batchsize)
         w_checkpoint=w_init
-        trajectory_w=[]
-        loss_list=[]
-        test_error_list=[]
+        recorder=self.recorder(epochs)
         for s in range(epochs):
-            #record the current model weights w 
-            trajectory_w.append(w_checkpoint) 
-            #calculate the test error for the current model weights w
-            test_error=self.function.value(w_checkpoint, self.test_sample_x, self.test_sample_y)
-            test_error_list.append(test_error)
-            #calculate the training error (loss) for the current model weights w
-            loss_list.append(self.function.average(w_checkpoint, self.training_sample_x, self.training_sample_y, self.function.value))
+            #record the current model weights w, its training error (loss) and test error
+            if self.schedule.due(s):
+                self.record(recorder, s, w_checkpoint)
             #the inner loop list of w is initialized, will fill in w_1,...,w_m (m=epochlength)
             w_innerloop_list=[]
             #start the inner loop at w_checkpoint
             w_previous=w_checkpoint
             w_innerloop_list.append(w_previous)
-            update_previous=-lr*self.function.average(w_checkpoint, self.training_sample_x, self.training_sample_y, self.function.grad)
+            update_previous=-lr*self.training_data.average(w_checkpoint, self.function.grad)
             w_current=w_previous-lr*update_previous
             for i in range(epochlength):
                 w_innerloop_list.append(w_current)
-                update_current = self.SARAH_update(w_current, w_previous, lr, update_previous)
+                update_current = self.SARAH_update(w_current, w_previous, lr, update_previous, batchsize)
                 w_next = w_current + update_current 
                 update_previous = update_current
                 w_previous = w_current
                 w_current = w_next
             #update the checkpoint by randomly select from the list in the inner loop w_1,...,w_m (m=epochlength)
-            w_checkpoint=choice(list(w_innerloop_list))
-        return trajectory_w, loss_list, test_error_list
+            w_checkpoint=w_innerloop_list[self.sampler.rng.integers(len(w_innerloop_list))]
+        return self.results(recorder)
+    
+    #the SAGA estimator update = the stored gradient of the sample is replaced, the step uses the unbiased estimator
+    # grad_j(w) - table_j + mean(table) (Defazio-Bach-Lacoste-Julien, NIPS 2014), table is the gradient_table
+    def SAGA_update(self, w, lr, table):
+        #sample one random index from the set [0,...,training_size-1]
+        index=self.sampler.index()
+        if self.running_loss is not None:
+            self.observe(w, *self.training_data.take(index))
+        mean=table.mean
+        new_grad, old_grad=table.replace(index, w)
+        grad = new_grad - old_grad + mean
+        update = -lr*grad
+        return update
+    
+    #the SAGA optimizer, iterates a certain number of steps, one new per-sample gradient per step and no full passes after the start
+    # compact: store only the residual per sample for the linear model (None: whenever the loss function allows it)
+    def SAGA_optimizer(self, w_init, steps, lr, compact=None):
+        w_current=np.asarray(w_init, dtype='float64')
+        table=gradient_table(self.function, w_current, self.training_data, compact)
+        recorder=self.recorder(steps)
+        for i in range(steps):
+            #record the current model weights w, its training error (loss) and test error
+            if self.schedule.due(i):
+                self.record(recorder, i, w_current)
+            w_current=w_current+self.SAGA_update(w_current, lr, table)
+        return self.results(recorder)
+    
+    #the SAG estimator update = the stored gradient of the sample is replaced, the step uses the (biased) mean of the table
+    # (Schmidt-Le Roux-Bach, 2017)
+    def SAG_update(self, w, lr, table):
+        #sample one random index from the set [0,...,training_size-1]
+        index=self.sampler.index()
+        if self.running_loss is not None:
+            self.observe(w, *self.training_data.take(index))
+        table.replace(index, w)
+        update = -lr*table.mean
+        return update
+    
+    #the SAG optimizer, iterates a certain number of steps
+    def SAG_optimizer(self, w_init, steps, lr, compact=None):
+        w_current=np.asarray(w_init, dtype='float64')
+        table=gradient_table(self.function, w_current, self.training_data, compact)
+        recorder=self.recorder(steps)
+        for i in range(steps):
+            #record the current model weights w, its training error (loss) and test error
+            if self.schedule.due(i):
+                self.record(recorder, i, w_current)
+            w_current=w_current+self.SAG_update(w_current, lr, table)
+        return self.results(recorder)
+    
+    #run the optimizer of the given name: SGD, SAGA and SAG iterate steps, SVRG and SARAH iterate epochs of epochlength inner steps
+    #the background evaluator of the run is closed at the end, also when the run fails
+    def run(self, optname, w_init, lr, steps, epochs, epochlength, batchsize=1, inner_batchsize=1):
+        try:
+            if optname=="SGD":
+                return self.SGD_optimizer(w_init, steps, lr, batchsize)
+            elif optname=="SVRG":
+                return self.SVRG_optimizer(w_init, epochs, epochlength, lr, batchsize=inner_batchsize)
+            elif optname=="SARAH":
+                return self.SARAH_optimizer(w_init, epochs, epochlength, lr, batchsize=inner_batchsize)
+            elif optname=="SAGA":
+                return self.SAGA_optimizer(w_init, steps, lr)
+            elif optname=="SAG":
+                return self.SAG_optimizer(w_init, steps, lr)
+            raise ValueError("unknown optimizer "+str(optname))
+        finally:
+            self.close()
+    
+    #close the background evaluator, a new one is started by the next run
+    def close(self):
+        if self.evaluator is not None:
+            evaluator=self.evaluator
+            self.evaluator=None
+            evaluator.close()
     
 
         
@@ -230,104 +532,66 @@ running the code, plot
 (3) the evolution of test error.
 """
 if __name__ == "__main__":
-    #generate the training samples (x_i, y_i)
-    training_sample_x=np.random.normal(0,1,size=(training_sample_size, 2))
-    training_sample_y=np.random.normal(0,1,size=training_sample_size)
+    starttime = datetime.datetime.now()
+    #generate the training samples (x_i, y_i), or open them from the .npy files
+    if training_files is None:
+        training_sample_x=np.random.normal(0,1,size=(training_sample_size, 2))
+        training_sample_y=np.random.normal(0,1,size=training_sample_size)
+        training_data=array_source(training_sample_x, training_sample_y)
+    else:
+        training_data=npy_source(*training_files)
+        training_sample_size=training_data.size
     #initialize the initial weights
     w_init=[1, 1]
-    #pick a particular pair of test sample (x, y) from the given distribution
-    test_sample_x=np.random.normal(0,1,size=2)
-    test_sample_y=np.random.normal(0,1,size=1)
+    #draw the held-out test samples (x, y) from the given distribution
+    test_sample_x=np.random.normal(0,1,size=(test_sample_size, 2))
+    test_sample_y=np.random.normal(0,1,size=test_sample_size)
     #optimization step obtain a sequence of losses and weights trajectory
+    jobs=[]
     for optname in {"SVRG"}:
         #set the loss function and the stochastic optimizer with given training and test samples
-        function=LossFunction(axA=A, axB=B)
+        function=LossFunction(axA=A, axB=B, backend=backend)
         optimizer=stochastic_optimizer(function=function, 
-                                       training_sample_x=training_sample_x,
-                                       training_sample_y=training_sample_y,
+                                       training_sample_x=None,
+                                       training_sample_y=None,
                                        test_sample_x=test_sample_x,
-                                       test_sample_y=test_sample_y)
-        #optimize, SGD, SVRG and SARAH
-        if optname=="SGD":
-            trajectory_w, loss_list, test_error_list=optimizer.SGD_optimizer(w_init, num_steps, lr, batchsize)
-        elif optname=="SVRG":
-            trajectory_w, loss_list, test_error_list=optimizer.SVRG_optimizer(w_init, num_epochs, epochlength, lr)
-        elif optname=="SARAH":
-            trajectory_w, loss_list, test_error_list=optimizer.SARAH_optimizer(w_init, num_epochs, epochlength, lr)        
-        else:
-            print(0)
+                                       test_sample_y=test_sample_y,
+                                       record_every=record_every,
+                                       sampler=index_sampler(training_sample_size, sampling, seed=seed),
+                                       training_data=training_data,
+                                       schedule=eval_schedule(eval_scheme, every=record_every, growth=eval_growth, seconds=eval_seconds),
+                                       running_loss=None if running_loss_decay is None else running_average(running_loss_decay),
+                                       background=background_eval)
+        #optimize, SGD, SVRG, SARAH, SAGA and SAG
+        trajectory_w, loss_list, test_error_list, eval_steps=optimizer.run(optname, w_init, lr, num_steps, num_epochs, epochlength, batchsize, inner_batchsize)
 
         #print the weight, loss and test error sequence
         print("weight trajectory=", trajectory_w)
         print("loss=", loss_list)
         print("test error=", test_error_list)
+        print("evaluated steps=", eval_steps)
         
-        #plot the trajctory as an animation
-        trajectory_w_1=[]
-        trajectory_w_2=[]
-        for index in range(len(trajectory_w)):
-            trajectory_w_1.append(trajectory_w[index][0])
-            trajectory_w_2.append(trajectory_w[index][1])
-        fig = plt.figure()
-        ax=Axes3D(fig)
-        line=ax.plot([],[],'b:')
-        point=ax.plot([],[],'bo',markersize=10)
-        images=[]
-        def init():
-            line=ax.plot([],[],'b:',markersize=8)
-            point=ax.plot([],[],'bo',markersize=10)
-            return line,point
-        def anmi(i):
-            ax.clear()
-            line =ax.plot(trajectory_w_1[0:i],trajectory_w_2[0:i],loss_list[0:i],'b:', markersize=8)
-            point = ax.plot(trajectory_w_1[i-1:i],trajectory_w_2[i-1:i],loss_list[i-1:i],'bo', markersize=10)
-            return line,point
+        #the file names of the figures for the given optimizer
         if optname=="SGD":
-            anim = animation.FuncAnimation(fig, anmi, init_func=init,
-                                           frames=num_steps, interval=10, blit=False,repeat=False)
-            anim.save(optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_batchsize='+str(batchsize)+'_learningrate='+str(lr)+'_steps='+str(num_steps)+'.gif', writer='imagemagick')
+            name=optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_batchsize='+str(batchsize)+'_learningrate='+str(lr)+'_steps='+str(num_steps)
         elif optname=="SVRG":
-            anim = animation.FuncAnimation(fig, anmi, init_func=init,
-                                           frames=num_epochs, interval=10, blit=False,repeat=False)
-            anim.save(optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.gif', writer='imagemagick')
+            name=optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'_batchsize='+str(inner_batchsize)
         elif optname=="SARAH":
-            anim = animation.FuncAnimation(fig, anmi, init_func=init,
-                                           frames=num_epochs, interval=10, blit=False,repeat=False)
-            anim.save(optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.gif', writer='imagemagick')
+            name=optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'_batchsize='+str(inner_batchsize)
+        elif optname=="SAGA" or optname=="SAG":
+            name=optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_steps='+str(num_steps)
         else:
             print(0)
+        #the trajctory as an animation, the training error (loss) and the test error
+        jobs.append(("animation", dict(x_1=trajectory_w[:,0], x_2=trajectory_w[:,1], z=loss_list, interval=10, max_frames=max_frames, processes=animation_processes,
+                                       filename=name+'.gif')))
+        jobs.append(("curves", dict(lines=[(eval_steps, loss_list)], xlabel='iteration', ylabel='loss', title=optname,
+                                    filename='Loss_'+name+'.jpg')))
+        jobs.append(("curves", dict(lines=[(eval_steps, test_error_list)], xlabel='iteration', ylabel='test error', title=optname,
+                                    filename='TestError_'+name+'.jpg')))
 
+    #render all the figures, on the Agg backend in a process pool when headless
+    render_all(jobs, headless=headless, processes=render_processes)
 
-        #plot the training error (loss) and the test error
-        fig = plt.figure()
-        mpl.rcParams['legend.fontsize'] = 10
-        plt.plot(loss_list)
-        plt.xlabel('iteration')
-        plt.ylabel('loss')
-        plt.title(optname)
-        if optname=="SGD":
-            plt.savefig('Loss_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_batchsize='+str(batchsize)+'_learningrate='+str(lr)+'_steps='+str(num_steps)+'.jpg')
-        elif optname=="SVRG":
-            plt.savefig('Loss_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.jpg')
-        elif optname=="SARAH":
-            plt.savefig('Loss_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.jpg')
-        else:
-            print(0)     
-        plt.show()
-
-        plt.plot(test_error_list)
-        plt.xlabel('iteration')
-        plt.ylabel('test error')
-        plt.title(optname)
-        if optname=="SGD":
-            plt.savefig('TestError_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_batchsize='+str(batchsize)+'_learningrate='+str(lr)+'_steps='+str(num_steps)+'.jpg')
-        elif optname=="SVRG":
-            plt.savefig('TestError_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.jpg')
-        elif optname=="SARAH":
-            plt.savefig('TestError_'+optname+'_A='+str(A)+'_B='+str(B)+'_trainingsize='+str(training_sample_size)+'_learningrate='+str(lr)+'_epochs='+str(num_epochs)+'_epochlength='+str(epochlength)+'.jpg')
-        else:
-            print(0)
-        plt.show()
-
-endtime = datetime.datetime.now()
-print("running time:", (endtime-starttime).seconds, "seconds.")
\ No newline at end of file
+    endtime = datetime.datetime.now()
+    print("running time:", (endtime-starttime).seconds, "seconds.")
\ No newline at end of file
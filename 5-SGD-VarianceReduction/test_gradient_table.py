@@ -0,0 +1,45 @@
+"""
+Tests of SAG and SAGA with both layouts of the gradient table against a direct implementation
+"""
+
+import pytest
+
+np=pytest.importorskip("numpy")
+pytest.importorskip("matplotlib")
+
+from samplers import index_sampler
+from stochastic_optimizers import LossFunction, stochastic_optimizer
+
+
+#the weights before every step of SAG or SAGA with the full list of per-sample gradients kept explicitly
+def reference(function, x, y, w_init, lr, steps, seed, saga):
+    sampler=index_sampler(len(y), "shuffle", seed=seed)
+    w=np.asarray(w_init, dtype='float64')
+    table=[function.grad(w, x[i], y[i]) for i in range(len(y))]
+    trajectory=[]
+    for step in range(steps):
+        trajectory.append(w.copy())
+        index=sampler.index()
+        mean=np.mean(table, axis=0)
+        new_grad=function.grad(w, x[index], y[index])
+        old_grad=table[index]
+        table[index]=new_grad
+        if saga:
+            w=w-lr*(new_grad-old_grad+mean)
+        else:
+            w=w-lr*np.mean(table, axis=0)
+    return np.array(trajectory)
+
+
+@pytest.mark.parametrize("saga", [True, False])
+@pytest.mark.parametrize("compact", [True, False])
+def test_table_layouts_match_reference(saga, compact):
+    rng=np.random.default_rng(0)
+    x=rng.normal(0, 1, size=(20, 2))
+    y=rng.normal(0, 1, size=20)
+    function=LossFunction(axA=1, axB=1, backend="numpy")
+    optimizer=stochastic_optimizer(function=function, training_sample_x=x, training_sample_y=y,
+                                   test_sample_x=x, test_sample_y=y, sampler=index_sampler(len(y), "shuffle", seed=3))
+    run=optimizer.SAGA_optimizer if saga else optimizer.SAG_optimizer
+    trajectory_w=run([1, 1], 50, 0.05, compact=compact)[0]
+    np.testing.assert_allclose(trajectory_w, reference(function, x, y, [1, 1], 0.05, 50, 3, saga), rtol=1e-10, atol=1e-12)
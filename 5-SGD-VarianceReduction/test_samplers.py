@@ -0,0 +1,32 @@
+"""
+Tests of the "shuffle" scheme of the index sampler
+"""
+
+import pytest
+
+np=pytest.importorskip("numpy")
+
+from samplers import index_sampler
+
+
+@pytest.mark.parametrize("size, batchsize", [(5, 3), (7, 4), (10, 10), (6, 1)])
+def test_shuffle_batches_have_unique_indices(size, batchsize):
+    sampler=index_sampler(size, "shuffle", seed=0)
+    for i in range(1000):
+        batch=sampler.draw(batchsize)
+        assert len(batch)==batchsize
+        assert len(np.unique(batch))==batchsize
+
+
+def test_shuffle_epoch_stays_a_permutation():
+    sampler=index_sampler(5, "shuffle", seed=1)
+    for i in range(200):
+        sampler.draw(3)
+        assert sorted(sampler.block.tolist())==list(range(5))
+
+
+def test_shuffle_batch_larger_than_data_set():
+    sampler=index_sampler(3, "shuffle", seed=0)
+    sampler.draw(2)
+    with pytest.raises(ValueError):
+        sampler.draw(4)
@@ -9,12 +9,16 @@ title: MNIST dataset trained on a small network, 5 different optimizers
 
 import tensorflow as tf
 import matplotlib.pyplot as plt
-import pandas as pd
+from mnist_data import mnist_pipeline
+from checkpoints import config_checkpoint
+from results_store import results_store
 
-# prepare the MNIST dataset
-mnist = tf.keras.datasets.mnist
-(x_train, y_train), (x_test, y_test) = mnist.load_data()
-x_train, x_test = x_train / 255.0, x_test / 255.0
+# the local MNIST file (mnist.npz) or directory, None downloads it, and the directory of its .npy cache (None: next to the file)
+mnist_path = None
+mnist_cache = None
+
+# prepare the MNIST dataset, converted once to float32 and fed through a shared tf.data pipeline
+pipeline = mnist_pipeline(path=mnist_path, cachedir=mnist_cache)
 
 # set the number of epochs
 num_epochs = 50
@@ -23,6 +27,9 @@ num_epochs = 50
 learning_rate = 0.01
 batch_size = 64
 
+# the directory of the per-epoch checkpoints, rerunning the script skips the finished runs and resumes the partial ones
+checkpoint_dir = 'checkpoints'
+
 # set the choices of optimizers
 optimizer_set = {"SGD": tf.keras.optimizers.SGD(learning_rate=learning_rate, momentum=0.0, nesterov=False),
                  "Adagrad": tf.keras.optimizers.Adagrad(learning_rate=learning_rate, initial_accumulator_value=0.1, epsilon=1e-07),
@@ -30,123 +37,127 @@ optimizer_set = {"SGD": tf.keras.optimizers.SGD(learning_rate=learning_rate, mom
                  "Adadelta": tf.keras.optimizers.Adadelta(learning_rate=learning_rate, rho=0.95, epsilon=1e-07),
                  "Adam": tf.keras.optimizers.Adam(learning_rate=learning_rate, beta_1=0.9, beta_2=0.999, epsilon=1e-07, amsgrad=False)}
 
-# define a data_frame to store the results of the model.
-# The column names are defined by the returning of "history" in the model fit
-optimizer_frame = pd.DataFrame(columns=('loss','accuracy','val_loss','val_accuracy'))
+# the store of the results, one row per optimizer and epoch appended as the epoch ends (.csv file or .parquet directory).
+# The metric columns are defined by the returning of "history" in the model fit
+results_file = 'optimizer_results.csv'
+store = results_store(results_file)
 
 # Training via different optimizers
 for (key,value) in optimizer_set.items():
-    # build the neural network model using keras sequencial model
-    model = tf.keras.models.Sequential([
-        tf.keras.layers.Flatten(input_shape=(28, 28)),
-        tf.keras.layers.Dense(128, activation='relu'),
-        tf.keras.layers.Dense(10, activation='softmax')
-    ])
-
-    # set the model parameters and optimizer
-    model.compile(optimizer=value,
-                  loss='sparse_categorical_crossentropy',
-                  metrics=['accuracy'])
-
-    # train and fit the model
-    print("\n********************* Optimizer=" + str(key) + ", batch_size=" + str(batch_size) + ", learning_rate=" + str(learning_rate) + " *********************")
-    """
-    when running the SGD optimizer, the number of iterations in each epoch depends on the batch_size.
-    for example:
-        num_iteration = int(mnist.num_train_data // batch_size)
-        937 = 60000 // 64
-    """
-    MLP =     model.fit(x_train,
-                        y_train,
-                        epochs=num_epochs,
-                        batch_size=batch_size,
-                        verbose=2,
-                        validation_data=(x_test, y_test))
-
-    # write the results of each epoch into the frame we defined
-    optimizer_frame.loc[optimizer_frame.shape[0] + 1] = [MLP.history['loss'],
-                                                         MLP.history['accuracy'],
-                                                         MLP.history['val_loss'],
-                                                         MLP.history['val_accuracy']]
-
-# modify the row names  of the optimizer_frame via "index"
-optimizer_frame.index = ["SGD","Adadelta","RMSprop", "Adagrad", "Adam"]
+    # the checkpoint of the run, a finished run is not trained again
+    checkpoint = config_checkpoint(checkpoint_dir, key, learning_rate, batch_size)
+    if not checkpoint.finished(num_epochs):
+        # resume the model and its optimizer state from the checkpoint, or build the neural network model using keras sequencial model
+        model = checkpoint.load_model(tf)
+        if model is None:
+            model = tf.keras.models.Sequential([
+                tf.keras.layers.Flatten(input_shape=(28, 28)),
+                tf.keras.layers.Dense(128, activation='relu'),
+                tf.keras.layers.Dense(10, activation='softmax')
+            ])
+
+            # set the model parameters and optimizer
+            model.compile(optimizer=value,
+                          loss='sparse_categorical_crossentropy',
+                          metrics=['accuracy'])
+
+        # train and fit the model from the last checkpointed epoch
+        print("\n********************* Optimizer=" + str(key) + ", batch_size=" + str(batch_size) + ", learning_rate=" + str(learning_rate) + " *********************")
+        """
+        when running the SGD optimizer, the number of iterations in each epoch depends on the batch_size.
+        for example:
+            num_iteration = int(mnist.num_train_data // batch_size)
+            937 = 60000 // 64
+        """
+        model.fit(epochs=num_epochs,
+                  initial_epoch=checkpoint.epoch,
+                  verbose=2,
+                  callbacks=[checkpoint.callback(tf, model), store.callback(tf, key, learning_rate, batch_size)],
+                  **pipeline.fit_arguments(batch_size))
+
+    # the epochs trained before the store existed are filled in from the history kept by the checkpoint
+    store.append_history(key, learning_rate, batch_size, checkpoint.history_slice(0, num_epochs))
+
+# the results of this learning rate and batch size, keyed by the name of the optimizer
+results = store.read()
+results = results[(results.learning_rate == learning_rate) & (results.batch_size == batch_size) & (results.epoch <= num_epochs)]
+runs = [(key, results[results.optimizer == key]) for key in optimizer_set]
 
 '''
 plt.figure(1)
 plt.suptitle('Optimizer_lr=' + str(learning_rate) + '_bs=' + str(batch_size))
 plt.subplot(2,2,1)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['loss'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['loss'])
 plt.title('Training_Loss')
 plt.ylabel('Training_Loss')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')    # row names
+plt.legend([key for (key, run) in runs], loc='upper right')    # optimizer names
 
 plt.subplot(2,2,2)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['accuracy'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['accuracy'])
 plt.title('Training_Accuracy')
 plt.ylabel('Training_Accuracy')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 
 plt.subplot(2,2,3)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['val_loss'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['val_loss'])
 plt.title('Testing_Loss')
 plt.ylabel('Testing_Loss')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 
 plt.subplot(2,2,4)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['val_accuracy'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['val_accuracy'])
 plt.title('Testing_Accuracy')
 plt.ylabel('Testing_Accuracy')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 
 plt.savefig('Optimizer_' + str(learning_rate) + '_bs=' + str(batch_size) + '.png')
 plt.show()
 '''
 
 plt.figure(1)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['loss'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['loss'])
 plt.title('Training_Loss_lr=' + str(learning_rate) + '_bs=' + str(batch_size))
 plt.ylabel('Training_Loss')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')    # row names
+plt.legend([key for (key, run) in runs], loc='upper right')    # optimizer names
 plt.savefig('Training_Loss_lr=' + str(learning_rate) + '_bs=' + str(batch_size) + '.png')
 plt.show()
 
 plt.figure(2)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['accuracy'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['accuracy'])
 plt.title('Training_Accuracy_lr=' + str(learning_rate) + '_bs=' + str(batch_size))
 plt.ylabel('Training_Accuracy')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 plt.savefig('Training_Accuracy_lr=' + str(learning_rate) + '_bs=' + str(batch_size) + '.png')
 plt.show()
 
 plt.figure(3)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['val_loss'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['val_loss'])
 plt.title('Testing_Loss_lr=' + str(learning_rate) + '_bs=' + str(batch_size))
 plt.ylabel('Testing_Loss')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 plt.savefig('Testing_Loss_lr=' + str(learning_rate) + '_bs=' + str(batch_size) + '.png')
 plt.show()
 
 plt.figure(4)
-for i in range(len(optimizer_set)):
-    plt.plot(optimizer_frame['val_accuracy'][i])
+for (key, run) in runs:
+    plt.plot(run.epoch, run['val_accuracy'])
 plt.title('Testing_Accuracy_lr=' + str(learning_rate) + '_bs=' + str(batch_size))
 plt.ylabel('Testing_Accuracy')
 plt.xlabel('Epoch')
-plt.legend(optimizer_frame.index, loc='upper right')
+plt.legend([key for (key, run) in runs], loc='upper right')
 plt.savefig('Testing_Accuracy_lr=' + str(learning_rate) + '_bs=' + str(batch_size) + '.png')
 plt.show()
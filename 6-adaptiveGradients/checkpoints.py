@@ -0,0 +1,98 @@
+"""
+Per-epoch checkpoints of the MNIST training runs
+
+after every epoch the model together with its optimizer state is saved as <name>-epoch<k>.h5,
+and the accumulated history as <name>.json, which also names the latest model file
+and keeps the training time so far and the performance profile of the run.
+The json file is replaced atomically after the model file is written, so it always points to a complete model.
+A rerun then skips the finished runs and resumes the partial ones from their last epoch.
+"""
+
+import os
+import json
+import time
+
+#the history keys of tensorflow 1.x ('acc') are stored under those of 2.x ('accuracy')#
+metric_names={'acc': 'accuracy', 'val_acc': 'val_accuracy'}
+
+
+#the name of the run of an optimizer with the given learning rate and batch size#
+#GD takes the whole training set as one batch whatever the batch size, so all its runs of a learning rate share the name bs=full#
+def config_name(optimizer_name, learning_rate, batch_size):
+    if optimizer_name=="GD":
+        batch_size='full'
+    return str(optimizer_name)+'_lr='+str(learning_rate)+'_bs='+str(batch_size)
+
+
+#the checkpoint of the run of an optimizer with the given learning rate and batch size, the one key used by all the scripts#
+def config_checkpoint(directory, optimizer_name, learning_rate, batch_size):
+    return run_checkpoint(directory, config_name(optimizer_name, learning_rate, batch_size))
+
+
+class run_checkpoint(object):
+    def __init__(self,
+                 directory,
+                 name):
+        """
+        directory: the directory of the checkpoints
+        name: the name of the run, config_name(optimizer_name, learning_rate, batch_size) (see config_checkpoint)
+        """
+        self.directory=directory
+        self.name=name
+        self.state_file=os.path.join(directory, name+'.json')
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as file:
+                state=json.load(file)
+        else:
+            state=dict(epoch=0, model=None, history={})
+        self.epoch=state["epoch"]
+        self.model_file=state["model"]
+        self.history=state["history"]
+        self.seconds=state.get("seconds", 0.0)
+        self.profile=state.get("profile")
+        self.mark=None
+
+    #start timing the training from here on, with the performance profile it runs under#
+    def start(self, profile=None):
+        self.profile=profile
+        self.mark=time.perf_counter()
+
+    #whether the run has reached the given number of epochs#
+    def finished(self, epochs):
+        return self.epoch>=epochs
+
+    #the saved model with its optimizer state, None before the first epoch#
+    def load_model(self, tf):
+        if self.model_file is None:
+            return None
+        return tf.keras.models.load_model(os.path.join(self.directory, self.model_file))
+
+    #the history of the epochs [start, stop)#
+    def history_slice(self, start=0, stop=None):
+        return {key: values[start:stop] for key, values in self.history.items()}
+
+    #save the model after the given (1-based) epoch with the metrics of the epoch and the training time since start()#
+    def save(self, model, epoch, logs):
+        if self.mark is not None:
+            now=time.perf_counter()
+            self.seconds+=now-self.mark
+            self.mark=now
+        model_file=self.name+'-epoch'+str(epoch)+'.h5'
+        model.save(os.path.join(self.directory, model_file))
+        for key, value in (logs or {}).items():
+            self.history.setdefault(metric_names.get(key, key), []).append(float(value))
+        with open(self.state_file+'.tmp', 'w') as file:
+            json.dump(dict(epoch=epoch, model=model_file, history=self.history, seconds=self.seconds, profile=self.profile), file)
+        os.replace(self.state_file+'.tmp', self.state_file)
+        #the model of the previous epoch is no longer referenced#
+        if self.model_file is not None and self.model_file!=model_file:
+            previous=os.path.join(self.directory, self.model_file)
+            if os.path.exists(previous):
+                os.remove(previous)
+        self.epoch=epoch
+        self.model_file=model_file
+
+    #the keras callback saving the checkpoint at the end of every epoch of model.fit#
+    def callback(self, tf, model):
+        return tf.keras.callbacks.LambdaCallback(on_epoch_end=lambda epoch, logs: self.save(model, epoch+1, logs))
@@ -0,0 +1,74 @@
+"""
+A tidy, columnar store of the training results
+
+one row per optimizer x learning rate x batch size x epoch with the metrics of the epoch,
+appended to the store as soon as the epoch ends:
+a .csv store is one CSV file with rows appended to it,
+a .parquet store is a directory of Parquet part files, one per append (needs pyarrow or fastparquet).
+Reading concatenates the rows; a row written again (e.g. by a resumed run) replaces the earlier one.
+"""
+
+import os
+import glob
+import pandas as pd
+
+# the columns of the store
+keys = ['optimizer', 'learning_rate', 'batch_size', 'epoch']
+metrics = ['loss', 'accuracy', 'val_loss', 'val_accuracy']
+columns = keys + metrics
+
+# the history keys of tensorflow 1.x ('acc') are stored under those of 2.x ('accuracy')
+metric_names = {'acc': 'accuracy', 'val_acc': 'val_accuracy'}
+
+
+class results_store(object):
+    def __init__(self, filename):
+        """
+        filename: the .csv file or the .parquet directory of the store
+        """
+        self.filename = filename
+        self.parquet = filename.endswith('.parquet')
+        self.parts = len(glob.glob(os.path.join(filename, 'part-*.parquet'))) if self.parquet else 0
+
+    # append rows (dicts with the columns of the store)
+    def append(self, rows):
+        frame = pd.DataFrame(rows, columns=columns)
+        if self.parquet:
+            os.makedirs(self.filename, exist_ok=True)
+            frame.to_parquet(os.path.join(self.filename, 'part-%06d.parquet' % self.parts), index=False)
+            self.parts += 1
+        else:
+            header = not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+            frame.to_csv(self.filename, mode='a', header=header, index=False)
+
+    # append the metrics (logs of keras) of one epoch (1-based) of a run
+    def append_epoch(self, optimizer_name, learning_rate, batch_size, epoch, logs):
+        row = dict(optimizer=optimizer_name, learning_rate=learning_rate, batch_size=batch_size, epoch=epoch)
+        for key, value in (logs or {}).items():
+            row[metric_names.get(key, key)] = float(value)
+        self.append([row])
+
+    # append the epochs of a history (dict of metric lists) that are not in the store yet
+    def append_history(self, optimizer_name, learning_rate, batch_size, history):
+        table = self.read()
+        stored = set(table[(table.optimizer == optimizer_name) & (table.learning_rate == learning_rate)
+                           & (table.batch_size == batch_size)].epoch)
+        rows = [dict({metric_names.get(key, key): values[epoch] for key, values in history.items()},
+                     optimizer=optimizer_name, learning_rate=learning_rate, batch_size=batch_size, epoch=epoch + 1)
+                for epoch in range(len(history['loss'])) if epoch + 1 not in stored]
+        if rows:
+            self.append(rows)
+
+    # all rows of the store, the last written row of each (optimizer, learning_rate, batch_size, epoch)
+    def read(self):
+        if self.parquet:
+            files = sorted(glob.glob(os.path.join(self.filename, 'part-*.parquet')))
+            table = pd.concat([pd.read_parquet(file) for file in files], ignore_index=True) if files else pd.DataFrame(columns=columns)
+        else:
+            table = pd.read_csv(self.filename) if os.path.exists(self.filename) else pd.DataFrame(columns=columns)
+        return table.drop_duplicates(subset=keys, keep='last').sort_values(keys, kind='stable').reset_index(drop=True)
+
+    # the keras callback appending the metrics of every epoch of model.fit
+    def callback(self, tf, optimizer_name, learning_rate, batch_size):
+        return tf.keras.callbacks.LambdaCallback(
+            on_epoch_end=lambda epoch, logs: self.append_epoch(optimizer_name, learning_rate, batch_size, epoch + 1, logs))
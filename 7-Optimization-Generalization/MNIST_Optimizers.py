@@ -7,19 +7,40 @@ author: Wenqing Hu and Jiali Zhang (Missouri S&T)
 
 import tensorflow as tf
 import matplotlib.pyplot as plt
+from mnist_data import mnist_pipeline
+from checkpoints import config_checkpoint, config_name
+from fullbatch import full_batch_trainer
+from training_loop import custom_trainer
 
-#prepare the MNIST dataset
-mnist = tf.keras.datasets.mnist
-(x_train, y_train), (x_test, y_test) = mnist.load_data()
-x_train, x_test = x_train / 255.0, x_test / 255.0
+#the full-batch GD accumulates the gradients in compiled steps, which run eagerly#
+if not tf.executing_eagerly():
+    tf.compat.v1.enable_eager_execution()
+
+#the local MNIST file (mnist.npz) or directory, None downloads it, and the directory of its .npy cache (None: next to the file)#
+mnist_path=None
+mnist_cache=None
+
+#prepare the MNIST dataset, converted once to float32 and fed through a shared tf.data pipeline#
+pipeline = mnist_pipeline(path=mnist_path, cachedir=mnist_cache)
 
 #set the number of epochs and the batch size
 num_epochs=100
 
+#the directory of the per-epoch checkpoints, rerunning the script skips the finished runs and resumes the partial ones#
+checkpoint_dir='checkpoints'
+
 #set the learning rate and batch size#
 learning_rate=0.1
 batch_size=64
 
+#GD accumulates the full gradient over micro-batches of this size and makes one update per epoch#
+micro_batch_size=1000
+
+#train the other optimizers with the compiled custom loop, recording the loss, gradient norm, update norm and wall time#
+#of the last step_buffer_size steps into Steps_<run>.npz#
+custom_loop=False
+step_buffer_size=100000
+
 #set the choices of optimizers#
 optimizer_name_set=["GD", "SGD", "Nesterov", "Adadelta", "Adagrad", "Adam", "RMSprop"]
 optimizer_set={"GD": tf.keras.optimizers.SGD(learning_rate=learning_rate, momentum=0.0, nesterov=False),
@@ -41,51 +62,70 @@ testloss_set=[]
 #train on various optimizers and lr and bs#
 for optimizer_name in optimizer_name_set:
     
-    #build the neural network model using keras sequencial model
-    model = tf.keras.models.Sequential([
-            tf.keras.layers.Flatten(input_shape=(28, 28)),
-            tf.keras.layers.Dense(128, activation='relu'),
-            tf.keras.layers.Dense(10, activation='softmax')
-            ])
+    #the checkpoint of the run, GD takes the whole training set as one batch#
+    run_batch_size=pipeline.train_size if optimizer_name=="GD" else batch_size
+    checkpoint=config_checkpoint(checkpoint_dir, optimizer_name, learning_rate, batch_size)
     
-    #set the model parameters and optimizer
-    model.compile(optimizer= optimizer_set[optimizer_name],
-                  loss= 'sparse_categorical_crossentropy',
-                  metrics=['accuracy'])
-
-    #train and fit the model, then validate
-    if optimizer_name=="GD":
-        print("\n********************* Optimizer="+str(optimizer_name)+", learningrate="+str(learning_rate)+" *********************")
-        history = model.fit(x_train, 
-                            y_train, 
-                            epochs=num_epochs, 
-                            batch_size=60000, 
-                            verbose=2,
-                            validation_data=(x_test, y_test))
+    if checkpoint.finished(num_epochs):
+        print("\n********************* Optimizer="+str(optimizer_name)+", batchsize="+str(run_batch_size)+", learningrate="+str(learning_rate)+" finished *********************")
     else:
-        print("\n********************* Optimizer="+str(optimizer_name)+", batchsize="+str(batch_size)+", learningrate="+str(learning_rate)+" *********************")
-        history = model.fit(x_train, 
-                            y_train, 
-                            epochs=num_epochs, 
-                            batch_size=batch_size, 
-                            verbose=2,
-                            validation_data=(x_test, y_test))
+        #resume the model and its optimizer state from the checkpoint, or build the neural network model using keras sequencial model
+        model = checkpoint.load_model(tf)
+        if model is None:
+            model = tf.keras.models.Sequential([
+                    tf.keras.layers.Flatten(input_shape=(28, 28)),
+                    tf.keras.layers.Dense(128, activation='relu'),
+                    tf.keras.layers.Dense(10, activation='softmax')
+                    ])
+            
+            #set the model parameters and optimizer
+            model.compile(optimizer= optimizer_set[optimizer_name],
+                          loss= 'sparse_categorical_crossentropy',
+                          metrics=['accuracy'])
+
+        #train and fit the model from the last checkpointed epoch, then validate
+        if optimizer_name=="GD":
+            print("\n********************* Optimizer="+str(optimizer_name)+", learningrate="+str(learning_rate)+" *********************")
+            trainer = full_batch_trainer(tf, model, model.optimizer, micro_batch_size)
+            trainer.fit(pipeline, 
+                        num_epochs, 
+                        initial_epoch=checkpoint.epoch,
+                        callbacks=[checkpoint.callback(tf, model)])
+        elif custom_loop:
+            print("\n********************* Optimizer="+str(optimizer_name)+", batchsize="+str(batch_size)+", learningrate="+str(learning_rate)+" *********************")
+            trainer = custom_trainer(tf, model, model.optimizer, step_buffer_size)
+            trainer.fit(pipeline, 
+                        run_batch_size, 
+                        num_epochs, 
+                        initial_epoch=checkpoint.epoch,
+                        callbacks=[checkpoint.callback(tf, model)])
+            trainer.buffer.save('Steps_'+config_name(optimizer_name, learning_rate, batch_size)+'.npz')
+        else:
+            print("\n********************* Optimizer="+str(optimizer_name)+", batchsize="+str(batch_size)+", learningrate="+str(learning_rate)+" *********************")
+            model.fit(epochs=num_epochs, 
+                      initial_epoch=checkpoint.epoch,
+                      verbose=2,
+                      callbacks=[checkpoint.callback(tf, model)],
+                      **pipeline.fit_arguments(run_batch_size))
+
+    #the accumulated history of all epochs is kept by the checkpoint
+    history = checkpoint.history_slice(0, num_epochs)
 
     trainacc=[]
     trainacc.append([optimizer_name])
-    trainacc.append(history.history['acc'])
+    trainacc.append(history['accuracy'])
 
     trainloss=[]
     trainloss.append([optimizer_name])
-    trainloss.append(history.history['loss'])
+    trainloss.append(history['loss'])
 
     testacc=[]
     testacc.append([optimizer_name])
-    testacc.append(history.history['val_acc'])
+    testacc.append(history['val_accuracy'])
 
     testloss=[]
     testloss.append([optimizer_name])
-    testloss.append(history.history['val_loss'])
+    testloss.append(history['val_loss'])
             
     trainacc_set.append(trainacc)
     trainloss_set.append(trainloss)
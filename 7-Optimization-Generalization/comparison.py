@@ -0,0 +1,241 @@
+"""
+Parallel comparison of the optimizers on MNIST
+
+every configuration (optimizer, learning rate, batch size) is trained in a worker process of a spawn pool,
+each worker applies its performance profile (thread budget, precision policy, XLA, see performance.py)
+before tensorflow starts, builds its own model and optimizer by name, and returns the per-epoch history.
+The histories are collected into one results table (a pandas DataFrame) with one row per configuration and epoch,
+together with the profile the run used.
+"""
+
+import os
+import time
+import multiprocessing
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from performance import make_profile, thread_environment, apply_profile, profile_columns
+
+#the local MNIST file (mnist.npz) or directory, None downloads it, and the directory of its .npy cache (None: next to the file, mnist_npy for downloads)#
+#MNIST is loaded once into the cache before the workers start#
+mnist_path=None
+mnist_cache=None
+
+#set the number of epochs#
+num_epochs=100
+
+#the grid of optimizers, learning rates and batch sizes#
+optimizer_name_set=["GD", "SGD", "Nesterov", "Adadelta", "Adagrad", "Adam", "RMSprop"]
+learning_rates=[0.1]
+batch_sizes=[64]
+
+#GD accumulates the full gradient over micro-batches of this size and makes one update per epoch#
+micro_batch_size=1000
+
+#train the other optimizers with the compiled custom loop, recording the per-step statistics into Steps_<run>.npz#
+custom_loop=False
+
+#the number of threads of each worker and the number of worker processes (None: as many as the cores allow)#
+threads_per_worker=2
+processes=None
+
+#the performance profile of the workers: precision "float32", "mixed_bfloat16" or "mixed_float16", and XLA JIT compilation#
+profile=make_profile(intra_op_threads=threads_per_worker, inter_op_threads=1, precision="float32", xla=False)
+
+#the results table, and the directory of the per-epoch checkpoints (None: no checkpoints), rerunning skips or resumes from them#
+results_file='comparison_results.csv'
+checkpoint_dir='checkpoints'
+
+#the columns of the results table, the history keys of tensorflow 1.x ('acc') are renamed to those of 2.x ('accuracy')#
+metrics=['loss', 'accuracy', 'val_loss', 'val_accuracy']
+metric_names={'acc': 'accuracy', 'val_acc': 'val_accuracy'}
+
+
+#build the optimizer of the given name and learning rate#
+def make_optimizer(tf, optimizer_name, learning_rate):
+    if optimizer_name=="GD" or optimizer_name=="SGD":
+        return tf.keras.optimizers.SGD(learning_rate=learning_rate, momentum=0.0, nesterov=False)
+    elif optimizer_name=="Nesterov":
+        return tf.keras.optimizers.SGD(learning_rate=learning_rate, momentum=0.1, nesterov=True)
+    elif optimizer_name=="Adadelta":
+        return tf.keras.optimizers.Adadelta(learning_rate=learning_rate, rho=0.95, epsilon=1e-07)
+    elif optimizer_name=="Adagrad":
+        return tf.keras.optimizers.Adagrad(learning_rate=learning_rate, initial_accumulator_value=0.1, epsilon=1e-07)
+    elif optimizer_name=="Adam":
+        return tf.keras.optimizers.Adam(learning_rate=learning_rate, beta_1=0.9, beta_2=0.999, epsilon=1e-07, amsgrad=False)
+    elif optimizer_name=="RMSprop":
+        return tf.keras.optimizers.RMSprop(learning_rate=learning_rate, rho=0.9, momentum=0.0, epsilon=1e-07, centered=False)
+    raise ValueError("unknown optimizer "+str(optimizer_name))
+
+
+#build the neural network model using keras sequencial model, the softmax output stays float32 under a mixed precision policy#
+def build_model(tf):
+    return tf.keras.models.Sequential([
+            tf.keras.layers.Flatten(input_shape=(28, 28)),
+            tf.keras.layers.Dense(128, activation='relu'),
+            tf.keras.layers.Dense(10, activation='softmax', dtype='float32')
+            ])
+
+
+#the state of a worker process: tensorflow, its profile in effect and the MNIST pipeline, set up once by init_worker#
+worker={}
+
+
+#pin the thread budget of the worker before tensorflow is imported, apply the rest of the profile, then load MNIST once#
+def init_worker(profile, path, cachedir):
+    thread_environment(profile)
+    import tensorflow as tf
+    #the full-batch GD accumulates the gradients in compiled steps, which run eagerly#
+    if not tf.executing_eagerly():
+        tf.compat.v1.enable_eager_execution()
+    from mnist_data import mnist_pipeline
+    worker["tf"]=tf
+    worker["profile"]=apply_profile(tf, profile)
+    worker["pipeline"]=mnist_pipeline(path=path, cachedir=cachedir)
+
+
+"""
+train one configuration dict(optimizer, learning_rate, batch_size, epochs), return it with its history and its running time
+with config["checkpoint_dir"] the model, its optimizer state and the history are saved there after every epoch (see checkpoints.py):
+a finished configuration is not trained again and a partial one resumes from its last epoch
+the returned history covers the epochs from config["initial_epoch"] (default 0) to config["epochs"]
+"""
+def train_config(config):
+    tf=worker["tf"]
+    pipeline=worker["pipeline"]
+    tf.keras.backend.clear_session()
+    initial_epoch=config.get("initial_epoch", 0)
+    checkpoint=None
+    model=None
+    if config.get("checkpoint_dir") is not None:
+        from checkpoints import config_checkpoint
+        checkpoint=config_checkpoint(config["checkpoint_dir"], config["optimizer"], config["learning_rate"], config["batch_size"])
+        if checkpoint.finished(config["epochs"]):
+            print("skipped finished Optimizer="+str(config["optimizer"])+", batchsize="+str(config["batch_size"])+", learningrate="+str(config["learning_rate"]), flush=True)
+            #the training time and profile saved with the run, checkpoints written before they were kept get the current profile#
+            return dict(config, history=checkpoint.history_slice(initial_epoch, config["epochs"]), seconds=checkpoint.seconds,
+                        profile=checkpoint.profile or worker["profile"])
+        model=checkpoint.load_model(tf)
+    if model is None:
+        model=build_model(tf)
+        model.compile(optimizer=make_optimizer(tf, config["optimizer"], config["learning_rate"]),
+                      loss='sparse_categorical_crossentropy',
+                      metrics=['accuracy'])
+    callbacks=[] if checkpoint is None else [checkpoint.callback(tf, model)]
+    start=time.perf_counter()
+    if checkpoint is not None:
+        checkpoint.start(worker["profile"])
+    if config["optimizer"]=="GD":
+        #GD takes the full gradient over the whole training set, accumulated over micro-batches#
+        from fullbatch import full_batch_trainer
+        trainer=full_batch_trainer(tf, model, model.optimizer, config.get("micro_batch_size", 1000), jit=worker["profile"]["xla"])
+        history=trainer.fit(pipeline, config["epochs"], initial_epoch=initial_epoch if checkpoint is None else checkpoint.epoch,
+                            callbacks=callbacks, verbose=0)
+    elif config.get("custom_loop"):
+        #the compiled custom loop with the per-step loss, gradient norm, update norm and wall time#
+        from training_loop import custom_trainer
+        from checkpoints import config_name
+        trainer=custom_trainer(tf, model, model.optimizer, jit=worker["profile"]["xla"])
+        history=trainer.fit(pipeline, config["batch_size"], config["epochs"], initial_epoch=initial_epoch if checkpoint is None else checkpoint.epoch,
+                            callbacks=callbacks, verbose=0)
+        trainer.buffer.save('Steps_'+config_name(config["optimizer"], config["learning_rate"], config["batch_size"])+'.npz')
+    else:
+        history=model.fit(epochs=config["epochs"], initial_epoch=initial_epoch if checkpoint is None else checkpoint.epoch,
+                          verbose=0, callbacks=callbacks, **pipeline.fit_arguments(config["batch_size"])).history
+    seconds=time.perf_counter()-start
+    if checkpoint is not None:
+        #the training time of the run over all its resumptions, as kept by the checkpoint#
+        history=checkpoint.history_slice(initial_epoch, config["epochs"])
+        seconds=checkpoint.seconds
+    else:
+        history={metric_names.get(key, key): [float(value) for value in values] for key, values in history.items()}
+    print("finished Optimizer="+str(config["optimizer"])+", batchsize="+str(config["batch_size"])+", learningrate="+str(config["learning_rate"])
+          +" in "+str(round(seconds))+" seconds", flush=True)
+    return dict(config, history=history, seconds=seconds, profile=worker["profile"])
+
+
+#the results table of the trained configurations, one row per configuration and epoch#
+def results_table(results):
+    rows=[]
+    for result in results:
+        for epoch in range(len(result["history"]["loss"])):
+            row=dict(optimizer=result["optimizer"], learning_rate=result["learning_rate"], batch_size=result["batch_size"],
+                     epoch=result.get("initial_epoch", 0)+epoch+1)
+            for metric in metrics:
+                row[metric]=result["history"][metric][epoch]
+            row["seconds"]=result["seconds"]
+            row.update(profile_columns(result.get("profile", {})))
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+#as many worker processes as there are cores for the thread budget of the profile#
+def default_processes(profile):
+    return max(1, (os.cpu_count() or 1)//max(1, profile["intra_op_threads"] or 1))
+
+
+#the directory of the .npy cache of downloaded MNIST, when no cache directory is given#
+download_cache='mnist_npy'
+
+
+#download or convert MNIST once in the parent process, return the cache directory that the workers memory-map#
+def prepare_mnist(path=None, cachedir=None):
+    from mnist_data import load_mnist
+    if path is None and cachedir is None:
+        cachedir=download_cache
+    load_mnist(path, cachedir)
+    return cachedir
+
+
+#a spawn pool of worker processes with the given performance profile, by default as many workers as there are cores for its thread budget#
+#MNIST is loaded into its .npy cache before the workers start, so they only memory-map it#
+def worker_pool(profile=profile, processes=None, path=None, cachedir=None):
+    if processes is None:
+        processes=default_processes(profile)
+    cachedir=prepare_mnist(path, cachedir)
+    context=multiprocessing.get_context("spawn")
+    return context.Pool(processes, initializer=init_worker, initargs=(profile, path, cachedir))
+
+
+#train all the configurations in a pool of worker processes, return the results table#
+def run_comparison(configs, profile=profile, processes=None, path=None, cachedir=None):
+    if processes is None:
+        processes=default_processes(profile)
+    processes=min(processes, len(configs))
+    with worker_pool(profile, processes, path, cachedir) as pool:
+        results=pool.map(train_config, configs, chunksize=1)
+    return results_table(results)
+
+
+#plot one metric of all optimizers for the given learning rate and batch size, the single full-batch GD run appears in every batch size#
+def plot_metric(table, metric, ylabel, title, filename, learning_rate, batch_size, loc='upper right'):
+    runs=table[(table.learning_rate==learning_rate) & ((table.batch_size==batch_size) | (table.optimizer=="GD"))]
+    names=[]
+    for optimizer_name, run in runs.groupby('optimizer', sort=False):
+        plt.plot(run.epoch, run[metric])
+        names.append(optimizer_name)
+    plt.title(title+'_lr='+str(learning_rate)+'_bs='+str(batch_size))
+    plt.ylabel(ylabel)
+    plt.xlabel('Epoch')
+    plt.legend(names, loc=loc)
+    plt.savefig(filename+'_lr='+str(learning_rate)+'_bs='+str(batch_size)+'.jpg')
+    plt.show()
+
+
+if __name__ == "__main__":
+    #GD always takes the whole training set as one batch, it is run with the first batch size only#
+    configs=[dict(optimizer=optimizer_name, learning_rate=learning_rate, batch_size=batch_size, epochs=num_epochs, checkpoint_dir=checkpoint_dir,
+                 micro_batch_size=micro_batch_size, custom_loop=custom_loop)
+             for optimizer_name in optimizer_name_set for learning_rate in learning_rates
+             for batch_size in (batch_sizes[:1] if optimizer_name=="GD" else batch_sizes)]
+    table=run_comparison(configs, profile, processes, mnist_path, mnist_cache)
+    table.to_csv(results_file, index=False)
+    print(table.groupby(['optimizer', 'learning_rate', 'batch_size']).last())
+
+    #compare on same learning rate and batchsize but different optimizers#
+    for learning_rate in learning_rates:
+        for batch_size in batch_sizes:
+            plot_metric(table, 'loss', 'Loss', 'Training Loss', 'training_loss', learning_rate, batch_size)
+            plot_metric(table, 'val_loss', 'Loss', 'Testing Loss', 'test_loss', learning_rate, batch_size)
+            plot_metric(table, 'accuracy', 'Accuracy', 'Training Accuracy', 'training_accuracy', learning_rate, batch_size, loc='lower right')
+            plot_metric(table, 'val_accuracy', 'Accuracy', 'Testing Accuracy', 'test_accuracy', learning_rate, batch_size, loc='lower right')
@@ -0,0 +1,90 @@
+"""
+Full-batch gradient descent by gradient accumulation
+
+the gradient of the mean loss over the whole training set is accumulated over micro-batches of a fixed size,
+each micro-batch gradient weighted by its share n_b/n of the training samples,
+and applied by the optimizer in one update per epoch.
+This is the same step as model.fit(batch_size=60000), with the memory bounded by the micro-batch.
+The train and accumulate steps are compiled with tf.function (optionally with XLA) and need eager execution.
+"""
+
+from performance import compile_function
+
+
+class full_batch_trainer(object):
+    def __init__(self,
+                 tf,
+                 model,
+                 optimizer,
+                 micro_batch_size=1000,
+                 jit=False):
+        """
+        tf: the tensorflow module
+        model: the keras model, compiled with the optimizer and the loss for the evaluation on the test set
+        optimizer: the keras optimizer applying the full gradient
+        micro_batch_size: the number of samples whose gradient is evaluated at once
+        jit: compile the steps with XLA
+        """
+        self.tf=tf
+        self.model=model
+        self.optimizer=optimizer
+        self.micro_batch_size=micro_batch_size
+        self.loss=tf.keras.losses.SparseCategoricalCrossentropy()
+        #the accumulated full gradient, the loss and the number of correct predictions of the epoch#
+        self.gradients=[tf.Variable(tf.zeros_like(variable), trainable=False) for variable in model.trainable_variables]
+        self.total_loss=tf.Variable(0.0, trainable=False)
+        self.correct=tf.Variable(0.0, trainable=False)
+        self.accumulate=compile_function(tf, self.accumulate_step, jit)
+        self.apply=compile_function(tf, self.apply_step, jit)
+
+    #add the gradient, the loss and the correct predictions of a micro-batch with the weight n_b/n#
+    def accumulate_step(self, x, y, weight):
+        tf=self.tf
+        with tf.GradientTape() as tape:
+            prediction=self.model(x, training=True)
+            loss=tf.cast(self.loss(y, prediction), 'float32')
+            #under the mixed_float16 policy keras wraps the optimizer to scale the loss#
+            scaled_loss=self.optimizer.get_scaled_loss(loss) if hasattr(self.optimizer, 'get_scaled_loss') else loss
+        values=tape.gradient(scaled_loss, self.model.trainable_variables)
+        if hasattr(self.optimizer, 'get_unscaled_gradients'):
+            values=self.optimizer.get_unscaled_gradients(values)
+        for gradient, value in zip(self.gradients, values):
+            gradient.assign_add(weight*value)
+        self.total_loss.assign_add(weight*loss)
+        self.correct.assign_add(tf.reduce_sum(tf.keras.metrics.sparse_categorical_accuracy(y, prediction)))
+
+    #apply the accumulated full gradient and reset the accumulators#
+    def apply_step(self):
+        self.optimizer.apply_gradients([(self.tf.identity(gradient), variable) for gradient, variable in zip(self.gradients, self.model.trainable_variables)])
+        for gradient in self.gradients:
+            gradient.assign(self.tf.zeros_like(gradient))
+
+    #one epoch: one pass over the micro-batches, then one update; return the training loss and accuracy before the update#
+    def train_epoch(self, pipeline):
+        self.total_loss.assign(0.0)
+        self.correct.assign(0.0)
+        for x, y in pipeline.train_pass(self.micro_batch_size):
+            weight=self.tf.cast(self.tf.shape(y)[0], 'float32')/pipeline.train_size
+            self.accumulate(x, y, weight)
+        loss=float(self.total_loss.numpy())
+        accuracy=float(self.correct.numpy())/pipeline.train_size
+        self.apply()
+        return loss, accuracy
+
+    """
+    train from initial_epoch to epochs, evaluating on the test set after every epoch
+    the keras callbacks get on_epoch_end(epoch, logs) as in model.fit, return the history dict of the epochs
+    """
+    def fit(self, pipeline, epochs, initial_epoch=0, callbacks=(), verbose=2):
+        history={'loss': [], 'accuracy': [], 'val_loss': [], 'val_accuracy': []}
+        for epoch in range(initial_epoch, epochs):
+            loss, accuracy=self.train_epoch(pipeline)
+            val_loss, val_accuracy=self.model.evaluate(pipeline.test(), steps=pipeline.steps(pipeline.test_size, pipeline.test_batch_size), verbose=0)
+            logs={'loss': loss, 'accuracy': accuracy, 'val_loss': float(val_loss), 'val_accuracy': float(val_accuracy)}
+            for key, value in logs.items():
+                history[key].append(value)
+            for callback in callbacks:
+                callback.on_epoch_end(epoch, logs)
+            if verbose:
+                print("Epoch "+str(epoch+1)+"/"+str(epochs)+" - "+" - ".join(key+": "+str(round(value, 4)) for key, value in logs.items()))
+        return history
@@ -0,0 +1,135 @@
+"""
+Grid search over optimizer x learning rate x batch size on MNIST with successive halving
+
+all the configurations of the grid are trained for a few epochs in the worker pool of comparison.py,
+then only the best 1/eta of them (by the last value of the metric) are trained on to eta times as many epochs,
+and so on until the survivors reach max_epochs. A configuration continues from the per-epoch checkpoint of its model
+and optimizer state (see checkpoints.py), so an interrupted search is resumed by running it again.
+Every finished rung of every configuration is appended as one JSON line to the results file.
+"""
+
+import json
+import math
+
+from comparison import worker_pool, default_processes, train_config, results_table
+from performance import make_profile
+
+#the local MNIST file (mnist.npz) or directory, None downloads it, and the directory of its .npy cache (None: next to the file, mnist_npy for downloads)#
+#MNIST is loaded once into the cache before the workers start#
+mnist_path=None
+mnist_cache=None
+
+#the grid of optimizers, learning rates and batch sizes#
+optimizer_name_set=["GD", "SGD", "Nesterov", "Adadelta", "Adagrad", "Adam", "RMSprop"]
+learning_rates=[0.01, 0.05, 0.1]
+batch_sizes=[32, 64, 128]
+
+#successive halving: the epochs of the first rung, the reduction factor eta and the epochs of the last rung#
+min_epochs=5
+eta=3
+max_epochs=100
+#the configurations are ranked by the last value of the metric, lower is better unless maximize#
+metric='val_loss'
+maximize=False
+
+#the number of threads of each worker and the number of worker processes (None: as many as the cores allow)#
+threads_per_worker=2
+processes=None
+
+#the performance profile of the workers, recorded with every result: precision "float32", "mixed_bfloat16" or "mixed_float16", and XLA#
+profile=make_profile(intra_op_threads=threads_per_worker, inter_op_threads=1, precision="float32", xla=False)
+
+#the results (JSON lines) and the directory of the per-epoch model checkpoints#
+results_file='gridsearch_results.jsonl'
+checkpoint_dir='gridsearch_checkpoints'
+
+
+#the number of epochs reached at the end of each rung: min_epochs, eta*min_epochs, ..., max_epochs#
+def rung_epochs(min_epochs, eta, max_epochs):
+    epochs=[]
+    rung=min_epochs
+    while rung<max_epochs:
+        epochs.append(rung)
+        rung=rung*eta
+    epochs.append(max_epochs)
+    return epochs
+
+
+#the value with the non-finite floats (diverged runs) replaced by None, which is written as null in standard JSON#
+def finite_json(value):
+    if isinstance(value, dict):
+        return {key: finite_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite_json(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+#append the results of a rung to the JSON lines file#
+def write_results(filename, results):
+    with open(filename, 'a') as file:
+        for result in results:
+            file.write(json.dumps(finite_json(result), allow_nan=False)+'\n')
+
+
+#read all the results written to the JSON lines file#
+def read_results(filename):
+    with open(filename) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+#whether the score is a finite number, a diverged run has a NaN or infinite (or missing) score#
+def finite_score(score):
+    return score is not None and math.isfinite(score)
+
+
+#the results sorted from the best to the worst score, the non-finite scores rank last#
+def rank_results(results, maximize=False):
+    return sorted(results, key=lambda result: (not finite_score(result["score"]),
+                                               (-result["score"] if maximize else result["score"]) if finite_score(result["score"]) else 0))
+
+
+"""
+run the successive halving over the configurations dict(optimizer, learning_rate, batch_size)
+return the results of all rungs, the last rung holds the surviving configurations
+"""
+def successive_halving(configs, min_epochs=5, eta=3, max_epochs=100, metric='val_loss', maximize=False,
+                       profile=None, processes=None, path=None, cachedir=None,
+                       results_file='gridsearch_results.jsonl', checkpoint_dir='gridsearch_checkpoints'):
+    if profile is None:
+        profile=make_profile()
+    if processes is None:
+        processes=default_processes(profile)
+    processes=min(processes, len(configs))
+    survivors=[dict(config, checkpoint_dir=checkpoint_dir) for config in configs]
+    all_results=[]
+    initial_epoch=0
+    with worker_pool(profile, processes, path, cachedir) as pool:
+        for rung, epochs in enumerate(rung_epochs(min_epochs, eta, max_epochs)):
+            tasks=[dict(config, epochs=epochs, initial_epoch=initial_epoch) for config in survivors]
+            results=pool.map(train_config, tasks, chunksize=1)
+            for result in results:
+                result["rung"]=rung
+                result["score"]=result["history"][metric][-1]
+            write_results(results_file, results)
+            all_results.extend(results)
+            print("rung "+str(rung)+": "+str(len(results))+" configurations trained to epoch "+str(epochs), flush=True)
+            #keep the best 1/eta of the configurations#
+            results=rank_results(results, maximize)
+            keep=max(1, int(math.ceil(len(results)/eta)))
+            survivors=[dict(optimizer=result["optimizer"], learning_rate=result["learning_rate"], batch_size=result["batch_size"],
+                            checkpoint_dir=checkpoint_dir) for result in results[:keep]]
+            initial_epoch=epochs
+    return all_results
+
+
+if __name__ == "__main__":
+    #GD always takes the whole training set as one batch, it is run with the first batch size only#
+    configs=[dict(optimizer=optimizer_name, learning_rate=learning_rate, batch_size=batch_size)
+             for optimizer_name in optimizer_name_set for learning_rate in learning_rates
+             for batch_size in (batch_sizes[:1] if optimizer_name=="GD" else batch_sizes)]
+    results=successive_halving(configs, min_epochs, eta, max_epochs, metric, maximize,
+                               profile, processes, mnist_path, mnist_cache, results_file, checkpoint_dir)
+    table=results_table(results)
+    print(table.groupby(['optimizer', 'learning_rate', 'batch_size']).last().sort_values(metric, ascending=not maximize))
@@ -0,0 +1,133 @@
+"""
+The MNIST input pipeline shared by the optimizer comparisons
+
+the images are converted once to float32 in [0, 1] (instead of float64 arrays x/255.0),
+then tf.data datasets are built on them: cached, shuffled every epoch, batched, repeated and prefetched.
+The datasets are kept per batch size, so all the optimizer runs with the same batch size reuse the same pipeline.
+MNIST can be read from a local mnist.npz file or directory instead of being downloaded; the converted arrays
+are then stored once as an uncompressed .npy cache that later runs memory-map without decompressing or normalizing.
+Tensorflow is only imported to build the pipeline or to download MNIST, so load_mnist on a local file needs numpy alone.
+"""
+
+import os
+import math
+import numpy as np
+
+
+#scale the uint8 images to float32 in [0, 1], in place after one conversion#
+def to_float32(images):
+    images=np.asarray(images, dtype='float32')
+    images/=255.0
+    return images
+
+
+#the arrays of the .npy cache, stored as <name>.npy#
+cache_names=("x_train", "y_train", "x_test", "y_test")
+
+
+def cache_complete(cachedir):
+    return cachedir is not None and all(os.path.exists(os.path.join(cachedir, name+'.npy')) for name in cache_names)
+
+
+#write the converted arrays to the .npy cache, each to a temporary file first so that an interrupted run leaves no broken cache#
+def write_cache(cachedir, arrays):
+    os.makedirs(cachedir, exist_ok=True)
+    for name, array in zip(cache_names, arrays):
+        filename=os.path.join(cachedir, name+'.npy')
+        with open(filename+'.tmp', 'wb') as file:
+            np.save(file, array)
+        os.replace(filename+'.tmp', filename)
+
+
+"""
+the MNIST training and test sets ((x_train, y_train), (x_test, y_test)), float32 images in [0, 1] and int64 labels
+path: None downloads MNIST through keras, otherwise a mnist.npz file in the keras format (x_train, y_train, x_test, y_test),
+      or a directory holding mnist.npz or the .npy cache
+cachedir: the directory of the .npy cache, by default the directory "mnist_npy" next to mnist.npz (no cache for downloads)
+once the cache exists the arrays are memory-mapped from it read-only
+"""
+def load_mnist(path=None, cachedir=None):
+    if path is not None and os.path.isdir(path):
+        if cachedir is None and cache_complete(path):
+            cachedir=path
+        path=os.path.join(path, 'mnist.npz')
+    if cachedir is None and path is not None:
+        cachedir=os.path.join(os.path.dirname(os.path.abspath(path)), 'mnist_npy')
+    if not cache_complete(cachedir):
+        if path is None:
+            import tensorflow as tf
+            (x_train, y_train), (x_test, y_test)=tf.keras.datasets.mnist.load_data()
+        else:
+            with np.load(path) as data:
+                x_train, y_train, x_test, y_test=(data[name] for name in cache_names)
+        arrays=(to_float32(x_train), y_train.astype('int64'), to_float32(x_test), y_test.astype('int64'))
+        if cachedir is None:
+            return (arrays[0], arrays[1]), (arrays[2], arrays[3])
+        write_cache(cachedir, arrays)
+    x_train, y_train, x_test, y_test=(np.load(os.path.join(cachedir, name+'.npy'), mmap_mode='r') for name in cache_names)
+    return (x_train, y_train), (x_test, y_test)
+
+
+class mnist_pipeline(object):
+    def __init__(self,
+                 train=None,
+                 test=None,
+                 test_batch_size=1000,
+                 shuffle_buffer=60000,
+                 seed=None,
+                 path=None,
+                 cachedir=None):
+        """
+        train, test: the (x, y) arrays of the training and test sets, None loads MNIST with load_mnist(path, cachedir)
+        test_batch_size: the batch size of the evaluation on the test set
+        shuffle_buffer: the size of the shuffle buffer, at least the training size gives a uniform shuffle
+        seed: the seed of the shuffling
+        """
+        import tensorflow as tf
+        self.autotune=tf.data.experimental.AUTOTUNE
+        if train is None or test is None:
+            train, test=load_mnist(path, cachedir)
+        self.train_size=len(train[1])
+        self.test_size=len(test[1])
+        self.test_batch_size=test_batch_size
+        self.shuffle_buffer=shuffle_buffer
+        self.seed=seed
+        self.train_base=tf.data.Dataset.from_tensor_slices(train).cache()
+        self.test_base=tf.data.Dataset.from_tensor_slices(test).cache()
+        self.datasets={}
+
+    #the number of batches of one pass over size samples#
+    def steps(self, size, batch_size):
+        return int(math.ceil(size/batch_size))
+
+    #the repeated training dataset of the given batch size, reshuffled every epoch#
+    def train(self, batch_size):
+        key=("train", batch_size)
+        if key not in self.datasets:
+            self.datasets[key]=(self.train_base
+                                .shuffle(self.shuffle_buffer, seed=self.seed, reshuffle_each_iteration=True)
+                                .batch(batch_size)
+                                .repeat()
+                                .prefetch(self.autotune))
+        return self.datasets[key]
+
+    #one pass over the training set in order, in batches of the given size (e.g. the micro-batches of full-batch GD)#
+    def train_pass(self, batch_size):
+        key=("train_pass", batch_size)
+        if key not in self.datasets:
+            self.datasets[key]=self.train_base.batch(batch_size).prefetch(self.autotune)
+        return self.datasets[key]
+
+    #the repeated test dataset#
+    def test(self):
+        key=("test", self.test_batch_size)
+        if key not in self.datasets:
+            self.datasets[key]=self.test_base.batch(self.test_batch_size).repeat().prefetch(self.autotune)
+        return self.datasets[key]
+
+    #the arguments of model.fit for training with the given batch size and validating on the test set#
+    def fit_arguments(self, batch_size):
+        return dict(x=self.train(batch_size),
+                    steps_per_epoch=self.steps(self.train_size, batch_size),
+                    validation_data=self.test(),
+                    validation_steps=self.steps(self.test_size, self.test_batch_size))
@@ -0,0 +1,399 @@
+"""
+The MNIST optimizer comparison in pure numpy
+
+the same 784-128-10 network as the keras models (Flatten, Dense 128 ReLU, Dense 10 softmax, Glorot uniform weights, zero biases)
+trained on the sparse categorical cross-entropy with batched backpropagation, and the update rules of the keras optimizers
+GD/SGD, Nesterov, Adadelta, Adagrad, Adam and RMSprop with the same hyperparameters as in comparison.py.
+The parameters, gradients, optimizer slots and the activations of every batch size are allocated once,
+all the updates are done in place. Tensorflow is never imported (MNIST has to be a local file or .npy cache, see mnist_data.py),
+so a run starts in a fraction of a second and many small experiments can be run side by side in a process pool.
+"""
+
+import os
+import time
+import multiprocessing
+import numpy as np
+
+from mnist_data import load_mnist
+from performance import make_profile, thread_environment
+from comparison import results_table, plot_metric
+
+#the local MNIST file (mnist.npz) or directory with the .npy cache, and the directory of its .npy cache (None: next to the file)#
+mnist_path='mnist.npz'
+mnist_cache=None
+
+#set the number of epochs#
+num_epochs=100
+
+#the grid of optimizers, learning rates and batch sizes, GD takes the whole training set as one batch#
+optimizer_name_set=["GD", "SGD", "Nesterov", "Adadelta", "Adagrad", "Adam", "RMSprop"]
+learning_rates=[0.1]
+batch_sizes=[64]
+
+#the seed of the initialization and the shuffling of every run#
+seed=1
+
+#the number of BLAS threads of each worker and the number of worker processes (None: as many as the cores allow)#
+threads_per_worker=1
+processes=None
+
+#the results table#
+results_file='numpy_comparison_results.csv'
+
+
+#the Glorot uniform initialization of keras: U(-limit, limit) with limit=sqrt(6/(fan_in+fan_out))#
+def glorot_uniform(rng, fan_in, fan_out, dtype='float32'):
+    limit=np.sqrt(6.0/(fan_in+fan_out))
+    return rng.uniform(-limit, limit, size=(fan_in, fan_out)).astype(dtype)
+
+
+class mlp(object):
+    def __init__(self,
+                 sizes=(784, 128, 10),
+                 seed=None,
+                 dtype='float32'):
+        """
+        sizes: the input, hidden and output sizes of the ReLU/softmax network
+        seed: the seed of the initialization
+        dtype: the floating point type of the parameters, the inputs are cast to it
+        """
+        rng=np.random.default_rng(seed)
+        self.sizes=sizes
+        self.dtype=dtype
+        #the parameters W1, b1, W2, b2 and their gradients, updated in place#
+        self.params=[glorot_uniform(rng, sizes[0], sizes[1], dtype), np.zeros(sizes[1], dtype),
+                     glorot_uniform(rng, sizes[1], sizes[2], dtype), np.zeros(sizes[2], dtype)]
+        self.grads=[np.zeros_like(param) for param in self.params]
+        #the activations per batch size#
+        self.buffers={}
+
+    #the preallocated hidden and output activations of a batch of the given size, the gathered inputs are allocated on demand#
+    def buffer(self, batch_size):
+        if batch_size not in self.buffers:
+            self.buffers[batch_size]=dict(hidden=np.empty((batch_size, self.sizes[1]), self.dtype),
+                                          delta=np.empty((batch_size, self.sizes[1]), self.dtype),
+                                          output=np.empty((batch_size, self.sizes[2]), self.dtype))
+        return self.buffers[batch_size]
+
+    #the batch of the samples of the given indices of the flattened images, None takes all of x without copying it#
+    def gather(self, x, indices=None):
+        batch=self.buffer(len(x) if indices is None else len(indices))
+        if indices is None:
+            batch["x"]=np.asarray(x, dtype=self.dtype)
+        else:
+            if "gathered" not in batch:
+                batch["gathered"]=np.empty((len(indices), self.sizes[0]), self.dtype)
+            np.take(x, indices, axis=0, out=batch["gathered"])
+            batch["x"]=batch["gathered"]
+        return batch
+
+    #the forward pass of the batch, the softmax probabilities are left in batch["output"]#
+    def forward(self, batch):
+        W1, b1, W2, b2=self.params
+        hidden=batch["hidden"]
+        output=batch["output"]
+        np.dot(batch["x"], W1, out=hidden)
+        hidden+=b1
+        np.maximum(hidden, 0, out=hidden)
+        np.dot(hidden, W2, out=output)
+        output+=b2
+        output-=output.max(axis=1, keepdims=True)
+        np.exp(output, out=output)
+        output/=output.sum(axis=1, keepdims=True)
+        return output
+
+    #the summed cross-entropy loss (probabilities clipped at 1e-7 as in keras) and the number of correct predictions of the batch#
+    def scores(self, output, y):
+        rows=np.arange(len(y))
+        loss=-np.log(np.maximum(output[rows, y], 1e-7)).sum(dtype='float64')
+        correct=np.count_nonzero(output.argmax(axis=1)==y)
+        return float(loss), correct
+
+    #forward and backward pass of the batch: the gradients of the mean loss are written into self.grads, return the summed loss and the correct predictions#
+    def loss_and_grad(self, batch, y):
+        W1, b1, W2, b2=self.params
+        gW1, gb1, gW2, gb2=self.grads
+        output=self.forward(batch)
+        loss, correct=self.scores(output, y)
+        #the gradient of the mean loss with respect to the logits: (p-onehot(y))/batch_size, in place of p#
+        output[np.arange(len(y)), y]-=1
+        output/=len(y)
+        hidden=batch["hidden"]
+        delta=batch["delta"]
+        np.dot(hidden.T, output, out=gW2)
+        output.sum(axis=0, out=gb2)
+        np.dot(output, W2.T, out=delta)
+        delta*=(hidden>0)
+        np.dot(batch["x"].T, delta, out=gW1)
+        delta.sum(axis=0, out=gb1)
+        return loss, correct
+
+    #the mean loss and the accuracy on (x, y), evaluated in batches of the given size#
+    def evaluate(self, x, y, batch_size=1000):
+        total_loss=0.0
+        total_correct=0
+        for start in range(0, len(y), batch_size):
+            batch=self.gather(x[start:start+batch_size])
+            loss, correct=self.scores(self.forward(batch), y[start:start+batch_size])
+            total_loss+=loss
+            total_correct+=correct
+        return total_loss/len(y), total_correct/len(y)
+
+
+#the in-place update rules, the slots (accumulators) are allocated on the first update#
+class optimizer(object):
+    #the number of slots and scratch buffers per parameter#
+    num_slots=0
+    num_scratch=1
+
+    def __init__(self, learning_rate):
+        self.learning_rate=learning_rate
+        self.iterations=0
+        self.slots=None
+
+    def slot_init(self, param):
+        return np.zeros_like(param)
+
+    def update(self, params, grads):
+        if self.slots is None:
+            self.slots=[[self.slot_init(param) for i in range(self.num_slots)] for param in params]
+            self.scratch=[[np.empty_like(param) for i in range(self.num_scratch)] for param in params]
+        self.iterations+=1
+        for param, grad, slots, scratch in zip(params, grads, self.slots, self.scratch):
+            self.update_param(param, grad, slots, scratch)
+
+
+#w-=lr*g, and with momentum m: v=m*v-lr*g, w+=v or for Nesterov w+=m*v-lr*g#
+class sgd(optimizer):
+    def __init__(self, learning_rate, momentum=0.0, nesterov=False):
+        super().__init__(learning_rate)
+        self.momentum=momentum
+        self.nesterov=nesterov
+        self.num_slots=1 if momentum else 0
+
+    def update_param(self, param, grad, slots, scratch):
+        step=scratch[0]
+        np.multiply(grad, self.learning_rate, out=step)
+        if not self.momentum:
+            param-=step
+            return
+        velocity=slots[0]
+        velocity*=self.momentum
+        velocity-=step
+        if self.nesterov:
+            param-=step
+            np.multiply(velocity, self.momentum, out=step)
+            param+=step
+        else:
+            param+=velocity
+
+
+#a+=g^2, w-=lr*g/(sqrt(a)+eps)#
+class adagrad(optimizer):
+    num_slots=1
+
+    def __init__(self, learning_rate, initial_accumulator_value=0.1, epsilon=1e-07):
+        super().__init__(learning_rate)
+        self.initial_accumulator_value=initial_accumulator_value
+        self.epsilon=epsilon
+
+    def slot_init(self, param):
+        return np.full_like(param, self.initial_accumulator_value)
+
+    def update_param(self, param, grad, slots, scratch):
+        accumulator, step=slots[0], scratch[0]
+        np.multiply(grad, grad, out=step)
+        accumulator+=step
+        np.sqrt(accumulator, out=step)
+        step+=self.epsilon
+        np.divide(grad, step, out=step)
+        step*=self.learning_rate
+        param-=step
+
+
+#a=rho*a+(1-rho)*g^2, w-=lr*g/(sqrt(a)+eps)#
+class rmsprop(optimizer):
+    num_slots=1
+
+    def __init__(self, learning_rate, rho=0.9, epsilon=1e-07):
+        super().__init__(learning_rate)
+        self.rho=rho
+        self.epsilon=epsilon
+
+    def update_param(self, param, grad, slots, scratch):
+        accumulator, step=slots[0], scratch[0]
+        np.multiply(grad, grad, out=step)
+        step*=1-self.rho
+        accumulator*=self.rho
+        accumulator+=step
+        np.sqrt(accumulator, out=step)
+        step+=self.epsilon
+        np.divide(grad, step, out=step)
+        step*=self.learning_rate
+        param-=step
+
+
+#a=rho*a+(1-rho)*g^2, d=g*sqrt(u+eps)/sqrt(a+eps), u=rho*u+(1-rho)*d^2, w-=lr*d#
+class adadelta(optimizer):
+    num_slots=2
+    num_scratch=2
+
+    def __init__(self, learning_rate, rho=0.95, epsilon=1e-07):
+        super().__init__(learning_rate)
+        self.rho=rho
+        self.epsilon=epsilon
+
+    def update_param(self, param, grad, slots, scratch):
+        accumulator, delta_accumulator=slots
+        denominator, delta=scratch
+        np.multiply(grad, grad, out=denominator)
+        denominator*=1-self.rho
+        accumulator*=self.rho
+        accumulator+=denominator
+        np.add(accumulator, self.epsilon, out=denominator)
+        np.sqrt(denominator, out=denominator)
+        np.add(delta_accumulator, self.epsilon, out=delta)
+        np.sqrt(delta, out=delta)
+        delta/=denominator
+        delta*=grad
+        np.multiply(delta, delta, out=denominator)
+        denominator*=1-self.rho
+        delta_accumulator*=self.rho
+        delta_accumulator+=denominator
+        delta*=self.learning_rate
+        param-=delta
+
+
+#m=b1*m+(1-b1)*g, v=b2*v+(1-b2)*g^2, w-=lr*sqrt(1-b2^t)/(1-b1^t)*m/(sqrt(v)+eps)#
+class adam(optimizer):
+    num_slots=2
+
+    def __init__(self, learning_rate, beta_1=0.9, beta_2=0.999, epsilon=1e-07):
+        super().__init__(learning_rate)
+        self.beta_1=beta_1
+        self.beta_2=beta_2
+        self.epsilon=epsilon
+
+    def update_param(self, param, grad, slots, scratch):
+        m, v=slots
+        step=scratch[0]
+        learning_rate=self.learning_rate*np.sqrt(1-self.beta_2**self.iterations)/(1-self.beta_1**self.iterations)
+        np.multiply(grad, 1-self.beta_1, out=step)
+        m*=self.beta_1
+        m+=step
+        np.multiply(grad, grad, out=step)
+        step*=1-self.beta_2
+        v*=self.beta_2
+        v+=step
+        np.sqrt(v, out=step)
+        step+=self.epsilon
+        np.divide(m, step, out=step)
+        step*=learning_rate
+        param-=step
+
+
+#build the optimizer of the given name and learning rate, the hyperparameters as in comparison.make_optimizer#
+def make_optimizer(optimizer_name, learning_rate):
+    if optimizer_name=="GD" or optimizer_name=="SGD":
+        return sgd(learning_rate, momentum=0.0, nesterov=False)
+    elif optimizer_name=="Nesterov":
+        return sgd(learning_rate, momentum=0.1, nesterov=True)
+    elif optimizer_name=="Adadelta":
+        return adadelta(learning_rate, rho=0.95, epsilon=1e-07)
+    elif optimizer_name=="Adagrad":
+        return adagrad(learning_rate, initial_accumulator_value=0.1, epsilon=1e-07)
+    elif optimizer_name=="Adam":
+        return adam(learning_rate, beta_1=0.9, beta_2=0.999, epsilon=1e-07)
+    elif optimizer_name=="RMSprop":
+        return rmsprop(learning_rate, rho=0.9, epsilon=1e-07)
+    raise ValueError("unknown optimizer "+str(optimizer_name))
+
+
+"""
+train the model with the optimizer on train=(x, y) in shuffled batches of the given size for the given epochs,
+evaluating on test=(x, y) after every epoch; the images are flattened, return the history dict of the epochs as in keras
+"""
+def fit(model, optimizer, train, test, batch_size, epochs, seed=None, test_batch_size=1000, verbose=2):
+    rng=np.random.default_rng(seed)
+    x_train=np.asarray(train[0]).reshape(len(train[1]), -1)
+    y_train=np.asarray(train[1])
+    x_test=np.asarray(test[0]).reshape(len(test[1]), -1)
+    y_test=np.asarray(test[1])
+    size=len(y_train)
+    history={'loss': [], 'accuracy': [], 'val_loss': [], 'val_accuracy': []}
+    for epoch in range(epochs):
+        #the whole training set as one batch needs no shuffling#
+        order=None if batch_size>=size else rng.permutation(size)
+        total_loss=0.0
+        total_correct=0
+        for start in range(0, size, batch_size):
+            if order is None:
+                batch=model.gather(x_train)
+                y=y_train
+            else:
+                indices=order[start:start+batch_size]
+                batch=model.gather(x_train, indices)
+                y=y_train[indices]
+            loss, correct=model.loss_and_grad(batch, y)
+            optimizer.update(model.params, model.grads)
+            total_loss+=loss
+            total_correct+=correct
+        val_loss, val_accuracy=model.evaluate(x_test, y_test, test_batch_size)
+        logs={'loss': total_loss/size, 'accuracy': total_correct/size, 'val_loss': val_loss, 'val_accuracy': val_accuracy}
+        for key, value in logs.items():
+            history[key].append(value)
+        if verbose:
+            print("Epoch "+str(epoch+1)+"/"+str(epochs)+" - "+" - ".join(key+": "+str(round(value, 4)) for key, value in logs.items()))
+    return history
+
+
+#the MNIST arrays of a worker process, loaded once by init_worker#
+worker={}
+
+
+def init_worker(path, cachedir):
+    worker["data"]=load_mnist(path, cachedir)
+
+
+#train one configuration dict(optimizer, learning_rate, batch_size, epochs, seed), return it with its history and its running time#
+def train_config(config):
+    train, test=worker["data"]
+    batch_size=len(train[1]) if config["optimizer"]=="GD" else config["batch_size"]
+    model=mlp(seed=config.get("seed"))
+    start=time.perf_counter()
+    history=fit(model, make_optimizer(config["optimizer"], config["learning_rate"]), train, test, batch_size, config["epochs"],
+                seed=config.get("seed"), verbose=0)
+    seconds=time.perf_counter()-start
+    print("finished Optimizer="+str(config["optimizer"])+", batchsize="+str(batch_size)+", learningrate="+str(config["learning_rate"])
+          +" in "+str(round(seconds))+" seconds", flush=True)
+    return dict(config, history=history, seconds=seconds, profile=dict(engine="numpy", numpy=np.__version__))
+
+
+#train all the configurations in a spawn pool of worker processes with threads BLAS threads each, return the results table#
+def run_comparison(configs, threads=threads_per_worker, processes=None, path=None, cachedir=None):
+    #the spawned workers inherit the thread count before they import numpy#
+    thread_environment(make_profile(intra_op_threads=threads))
+    if processes is None:
+        processes=max(1, (os.cpu_count() or 1)//max(1, threads or 1))
+    processes=min(processes, len(configs))
+    context=multiprocessing.get_context("spawn")
+    with context.Pool(processes, initializer=init_worker, initargs=(path, cachedir)) as pool:
+        results=pool.map(train_config, configs, chunksize=1)
+    return results_table(results)
+
+
+if __name__ == "__main__":
+    configs=[dict(optimizer=optimizer_name, learning_rate=learning_rate, batch_size=batch_size, epochs=num_epochs, seed=seed)
+             for optimizer_name in optimizer_name_set for learning_rate in learning_rates
+             for batch_size in (batch_sizes[:1] if optimizer_name=="GD" else batch_sizes)]
+    table=run_comparison(configs, threads_per_worker, processes, mnist_path, mnist_cache)
+    table.to_csv(results_file, index=False)
+    print(table.groupby(['optimizer', 'learning_rate', 'batch_size']).last())
+
+    #compare on same learning rate and batchsize but different optimizers#
+    for learning_rate in learning_rates:
+        for batch_size in batch_sizes:
+            plot_metric(table, 'loss', 'Loss', 'Training Loss', 'numpy_training_loss', learning_rate, batch_size)
+            plot_metric(table, 'val_loss', 'Loss', 'Testing Loss', 'numpy_test_loss', learning_rate, batch_size)
+            plot_metric(table, 'accuracy', 'Accuracy', 'Training Accuracy', 'numpy_training_accuracy', learning_rate, batch_size, loc='lower right')
+            plot_metric(table, 'val_accuracy', 'Accuracy', 'Testing Accuracy', 'numpy_test_accuracy', learning_rate, batch_size, loc='lower right')
@@ -0,0 +1,85 @@
+"""
+Performance profiles of the MNIST runs
+
+a profile fixes the CPU throughput settings of a worker: the intra-op and inter-op thread counts,
+the precision policy ("float32", "mixed_bfloat16" or "mixed_float16") and XLA JIT compilation.
+"mixed_bfloat16" needs a CPU with native bfloat16 instructions (AVX512_BF16/AMX on x86, BF16 on ARM).
+The thread counts are exported to the OpenMP/MKL/OpenBLAS environment before tensorflow is imported,
+then apply_profile sets them up in tensorflow and returns the profile that is actually in effect
+(a precision policy the tensorflow version or the CPU does not support falls back to "float32"),
+which is recorded with the results so that timings are comparable.
+"""
+
+import os
+
+default_profile=dict(intra_op_threads=None, inter_op_threads=None, precision="float32", xla=False)
+
+
+#a profile with the given settings, the others at their defaults#
+def make_profile(**settings):
+    unknown=set(settings)-set(default_profile)
+    if unknown:
+        raise ValueError("unknown profile settings "+str(sorted(unknown)))
+    return dict(default_profile, **settings)
+
+
+#export the thread count to the native thread pools, before tensorflow is imported#
+def thread_environment(profile):
+    if profile["intra_op_threads"] is not None:
+        for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[variable]=str(profile["intra_op_threads"])
+
+
+#whether the CPU has native bfloat16 instructions, read from the flags of /proc/cpuinfo (False where it is not available)#
+def bfloat16_supported():
+    try:
+        with open('/proc/cpuinfo') as file:
+            flags=set(file.read().split())
+    except OSError:
+        return False
+    return bool(flags & {"avx512_bf16", "amx_bf16", "bf16"})
+
+
+#set the global keras precision policy, return the name of the policy in effect#
+def set_precision(tf, precision):
+    if precision=="float32":
+        return precision
+    if precision=="mixed_bfloat16" and not bfloat16_supported():
+        print("the CPU has no bfloat16 instructions, using float32")
+        return "float32"
+    mixed_precision=getattr(tf.keras, "mixed_precision", None)
+    if mixed_precision is not None and hasattr(mixed_precision, "set_global_policy"):
+        mixed_precision.set_global_policy(precision)
+    elif mixed_precision is not None and hasattr(mixed_precision, "experimental"):
+        mixed_precision.experimental.set_policy(precision)
+    else:
+        print("the precision policy "+str(precision)+" is not supported by tensorflow "+tf.__version__+", using float32")
+        return "float32"
+    return precision
+
+
+#apply the profile in tensorflow, right after it is imported; return the profile in effect with the tensorflow version#
+def apply_profile(tf, profile):
+    if profile["intra_op_threads"] is not None:
+        tf.config.threading.set_intra_op_parallelism_threads(profile["intra_op_threads"])
+    if profile["inter_op_threads"] is not None:
+        tf.config.threading.set_inter_op_parallelism_threads(profile["inter_op_threads"])
+    precision=set_precision(tf, profile["precision"])
+    if profile["xla"]:
+        tf.config.optimizer.set_jit(True)
+    return dict(profile, precision=precision, tensorflow=tf.__version__)
+
+
+#compile the function with tf.function, with XLA if jit#
+def compile_function(tf, function, jit=False):
+    if not jit:
+        return tf.function(function)
+    try:
+        return tf.function(function, jit_compile=True)
+    except TypeError:
+        return tf.function(function, experimental_compile=True)
+
+
+#the profile as columns of a results table#
+def profile_columns(profile):
+    return {'profile_'+key: value for key, value in profile.items()}
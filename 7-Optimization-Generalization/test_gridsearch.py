@@ -0,0 +1,27 @@
+"""
+Tests of the ranking and the results file of the successive halving
+"""
+
+import math
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("matplotlib")
+
+from gridsearch import rank_results, write_results, read_results
+
+
+def test_rank_results_puts_nan_scores_last():
+    results=[dict(name=name, score=score) for name, score in (("a", 3.0), ("b", float('nan')), ("c", 1.0), ("d", 2.0))]
+    assert [result["name"] for result in rank_results(results)]==["c", "d", "a", "b"]
+    assert [result["name"] for result in rank_results(results, maximize=True)]==["a", "d", "c", "b"]
+
+
+def test_write_results_writes_nan_as_null(tmp_path):
+    filename=str(tmp_path/"results.jsonl")
+    write_results(filename, [dict(score=float('nan'), history={'val_loss': [0.5, float('inf')]})])
+    assert "NaN" not in open(filename).read()
+    result=read_results(filename)[0]
+    assert result["score"] is None
+    assert result["history"]["val_loss"]==[0.5, None]
+    assert math.isfinite(result["history"]["val_loss"][0])
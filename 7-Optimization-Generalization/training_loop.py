@@ -0,0 +1,120 @@
+"""
+A custom training loop with per-step instrumentation
+
+the train step of the keras model and optimizer is compiled with tf.function and, besides the update,
+computes the loss, the gradient norm and the update norm of the step. These are written into a ring buffer
+kept on the device (a tf.Variable), so recording them needs no transfer to the host per step;
+only the wall time of the step is taken on the host, into a numpy ring buffer of the same size.
+The last `capacity` steps can be read back at any time, e.g. after every epoch, and saved as .npz.
+The compiled steps (optionally with XLA) need eager execution.
+"""
+
+import time
+import numpy as np
+
+from performance import compile_function
+
+
+class step_ring_buffer(object):
+    #the per-step quantities: column 0-2 on the device, the wall time on the host#
+    fields=("loss", "grad_norm", "update_norm")
+
+    def __init__(self, tf, capacity=100000):
+        self.capacity=int(capacity)
+        self.stats=tf.Variable(tf.zeros((self.capacity, len(self.fields))), trainable=False)
+        self.seconds=np.zeros(self.capacity)
+        self.count=0
+
+    #the position of the next step in the buffer#
+    def position(self):
+        return self.count%self.capacity
+
+    #record the wall time of the step whose statistics were written at position()#
+    def advance(self, seconds):
+        self.seconds[self.position()]=seconds
+        self.count+=1
+
+    #the recorded steps in chronological order: dict of the step index, loss, grad_norm, update_norm and seconds#
+    def read(self):
+        size=min(self.count, self.capacity)
+        order=(np.arange(size)+(self.count-size))%self.capacity
+        stats=self.stats.numpy()[order]
+        result={"step": np.arange(self.count-size, self.count)}
+        for j, name in enumerate(self.fields):
+            result[name]=stats[:, j]
+        result["seconds"]=self.seconds[order]
+        return result
+
+    def save(self, filename):
+        np.savez(filename, **self.read())
+
+
+class custom_trainer(object):
+    def __init__(self,
+                 tf,
+                 model,
+                 optimizer,
+                 capacity=100000,
+                 jit=False):
+        """
+        tf: the tensorflow module
+        model: the keras model, compiled with the optimizer and the loss for the evaluation on the test set
+        optimizer: the keras optimizer of the updates
+        capacity: the number of the latest steps kept in the ring buffer
+        jit: compile the train step with XLA
+        """
+        self.tf=tf
+        self.model=model
+        self.optimizer=optimizer
+        self.loss=tf.keras.losses.SparseCategoricalCrossentropy()
+        self.train_loss=tf.keras.metrics.Mean()
+        self.train_accuracy=tf.keras.metrics.SparseCategoricalAccuracy()
+        self.buffer=step_ring_buffer(tf, capacity)
+        self.train_step=compile_function(tf, self.step, jit)
+
+    #one update on the batch (x, y), its loss, gradient norm and update norm are written at the given position of the ring buffer#
+    def step(self, x, y, position):
+        tf=self.tf
+        variables=self.model.trainable_variables
+        with tf.GradientTape() as tape:
+            prediction=self.model(x, training=True)
+            loss=tf.cast(self.loss(y, prediction), 'float32')
+            #under the mixed_float16 policy keras wraps the optimizer to scale the loss#
+            scaled_loss=self.optimizer.get_scaled_loss(loss) if hasattr(self.optimizer, 'get_scaled_loss') else loss
+        gradients=tape.gradient(scaled_loss, variables)
+        if hasattr(self.optimizer, 'get_unscaled_gradients'):
+            gradients=self.optimizer.get_unscaled_gradients(gradients)
+        before=[tf.identity(variable) for variable in variables]
+        self.optimizer.apply_gradients(zip(gradients, variables))
+        update_norm=tf.linalg.global_norm([variable-old for variable, old in zip(variables, before)])
+        self.buffer.stats.scatter_nd_update([[position]], [tf.stack([loss, tf.linalg.global_norm(gradients), update_norm])])
+        self.train_loss.update_state(loss)
+        self.train_accuracy.update_state(y, prediction)
+
+    """
+    train with the given batch size from initial_epoch to epochs, evaluating on the test set after every epoch
+    the keras callbacks get on_epoch_end(epoch, logs) as in model.fit, return the history dict of the epochs
+    """
+    def fit(self, pipeline, batch_size, epochs, initial_epoch=0, callbacks=(), verbose=2):
+        tf=self.tf
+        history={'loss': [], 'accuracy': [], 'val_loss': [], 'val_accuracy': []}
+        batches=iter(pipeline.train(batch_size))
+        steps=pipeline.steps(pipeline.train_size, batch_size)
+        for epoch in range(initial_epoch, epochs):
+            self.train_loss.reset_states()
+            self.train_accuracy.reset_states()
+            for i in range(steps):
+                x, y=next(batches)
+                start=time.perf_counter()
+                self.train_step(x, y, tf.constant(self.buffer.position()))
+                self.buffer.advance(time.perf_counter()-start)
+            val_loss, val_accuracy=self.model.evaluate(pipeline.test(), steps=pipeline.steps(pipeline.test_size, pipeline.test_batch_size), verbose=0)
+            logs={'loss': float(self.train_loss.result().numpy()), 'accuracy': float(self.train_accuracy.result().numpy()),
+                  'val_loss': float(val_loss), 'val_accuracy': float(val_accuracy)}
+            for key, value in logs.items():
+                history[key].append(value)
+            for callback in callbacks:
+                callback.on_epoch_end(epoch, logs)
+            if verbose:
+                print("Epoch "+str(epoch+1)+"/"+str(epochs)+" - "+" - ".join(key+": "+str(round(value, 4)) for key, value in logs.items()))
+        return history